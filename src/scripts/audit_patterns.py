@@ -0,0 +1,169 @@
+"""
+Single-pass pattern audit over a chunk corpus.
+
+All patterns are combined into one regex, so every chunk is scanned once however many
+patterns are audited. For each pattern the audit counts non-overlapping hits (the
+same as pat.finditer), the chunks containing at least one, and whether each hit
+starts a line (only whitespace before it on its line) or sits mid-line. It also
+keeps the first N hits with a context window.
+
+Usage:
+    from audit_patterns import PatternAudit
+    audit = PatternAudit({"page_dash": r'–\\s*\\d+\\s*–'}, examples=3)
+    for c in chunks:
+        audit.add(c["text"], label=c["section"])
+    audit.print()
+
+    python audit_patterns.py normativa_chunks_clean.json            # default header/footer patterns
+    python audit_patterns.py chunks.jsonl --out audit.json --examples 5
+"""
+import json, re, argparse
+
+from chunk_io import iter_chunks
+
+# Header/footer fragments left behind by the BOE PDF extraction
+BOILERPLATE_PATTERNS = {
+    "BOLETÍN OFICIAL": re.compile(r'BOLET[IÍ]N OFICIAL', re.IGNORECASE),
+    "CÓDIGO LABORAL": re.compile(r'C[OÓ]DIGO LABORAL', re.IGNORECASE),
+    "www.boe.es": re.compile(r'www\.boe\.es'),
+    "LEGISLACIÓN CONSOLIDADA": re.compile(r'LEGISLACI[OÓ]N CONSOLIDADA', re.IGNORECASE),
+    "Página N de N": re.compile(r'P[aá]gina\s+\d+\s+de\s+\d+', re.IGNORECASE),
+    "– N –": re.compile(r'–\s*\d+\s*–'),
+    "- N -": re.compile(r'-\s*\d+\s*-'),
+    "Verificable en": re.compile(r'[Vv]erificable en'),
+    "CVE-BOE": re.compile(r'CVE-BOE'),
+    "cve:": re.compile(r'cve:', re.IGNORECASE),
+    "Núm.": re.compile(r'N[uú]m\.\s*\d+'),
+    "Sec.": re.compile(r'Sec\.\s*[IVX]+'),
+}
+
+# Flags that can be scoped to one alternative with (?flags:...)
+_SCOPED_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"), (re.VERBOSE, "x"))
+
+
+def _scoped(pat):
+    flags = "".join(f for flag, f in _SCOPED_FLAGS if pat.flags & flag)
+    return f"(?{flags}:{pat.pattern})" if flags else f"(?:{pat.pattern})"
+
+
+class PatternAudit:
+    """Counts and examples for a set of named patterns, built up chunk by chunk."""
+
+    def __init__(self, patterns, examples=3, context=40):
+        self.names = list(patterns)
+        self.patterns = [re.compile(p) if isinstance(p, str) else p for p in patterns.values()]
+        # Any-pattern scan: its matches are the only positions where some pattern can start
+        self.combined = re.compile("|".join(_scoped(p) for p in self.patterns))
+        self.max_examples = examples
+        self.context = context
+        self.chunks = 0
+        self.chars = 0
+        self.stats = {name: {"hits": 0, "chunks": 0, "line_start": 0, "mid_line": 0, "examples": []}
+                      for name in self.names}
+
+    def add(self, text, label=None):
+        """Audit one chunk text; label identifies it in the examples."""
+        index = self.chunks
+        self.chunks += 1
+        self.chars += len(text)
+        n = len(self.patterns)
+        next_free = [0] * n  # end of each pattern's last hit, as finditer would resume
+        seen = [False] * n
+        pos = 0
+        while True:
+            cand = self.combined.search(text, pos)
+            if cand is None:
+                break
+            start = cand.start()
+            for k in range(n):
+                if start < next_free[k]:
+                    continue
+                m = self.patterns[k].match(text, start)
+                if m is None:
+                    continue
+                next_free[k] = m.end() if m.end() > start else start + 1
+                self._hit(self.names[k], text, m, index, label, first_in_chunk=not seen[k])
+                seen[k] = True
+            pos = start + 1
+
+    def _hit(self, name, text, m, index, label, first_in_chunk):
+        st = self.stats[name]
+        st["hits"] += 1
+        if first_in_chunk:
+            st["chunks"] += 1
+        line_start = m.group().startswith("\n") or \
+            not text[text.rfind("\n", 0, m.start()) + 1:m.start()].strip()
+        st["line_start" if line_start else "mid_line"] += 1
+        if len(st["examples"]) < self.max_examples:
+            start = max(0, m.start() - self.context)
+            end = min(len(text), m.end() + self.context)
+            st["examples"].append({
+                "chunk": index,
+                "label": label,
+                "line_start": line_start,
+                "context": text[start:end].replace("\n", "\\n"),
+            })
+
+    def merge(self, other):
+        """Fold in the audit of the chunks that came right after these (e.g. a worker batch)."""
+        for name in self.names:
+            st, ot = self.stats[name], other.stats[name]
+            for key in ("hits", "chunks", "line_start", "mid_line"):
+                st[key] += ot[key]
+            for ex in ot["examples"][:self.max_examples - len(st["examples"])]:
+                st["examples"].append(dict(ex, chunk=ex["chunk"] + self.chunks))
+        self.chunks += other.chunks
+        self.chars += other.chars
+
+    def report(self):
+        return {
+            "chunks": self.chunks,
+            "chars": self.chars,
+            "patterns": {name: dict(self.stats[name], pattern=pat.pattern)
+                         for name, pat in zip(self.names, self.patterns)},
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+    def print(self, examples=True):
+        total = self.chunks or 1
+        for name in self.names:
+            st = self.stats[name]
+            if not st["hits"]:
+                print(f"  {name}: 0 ✓")
+                continue
+            print(f"  {name}: {st['hits']} hits in {st['chunks']}/{self.chunks} chunks "
+                  f"({st['chunks']*100//total}%) — {st['line_start']} at line start, {st['mid_line']} mid-line")
+            if examples:
+                for ex in st["examples"]:
+                    where = f" [{str(ex['label'])[:50]}]" if ex["label"] else ""
+                    print(f"      #{ex['chunk']}{where} ...{ex['context']}...")
+
+
+def audit_chunks(chunks, patterns=BOILERPLATE_PATTERNS, examples=3, context=40):
+    audit = PatternAudit(patterns, examples=examples, context=context)
+    for c in chunks:
+        audit.add(c["text"], label=c.get("section"))
+    return audit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count header/footer patterns across a chunk file in one pass")
+    parser.add_argument("chunks", help="Chunk file (.json or .jsonl)")
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--examples", type=int, default=3, help="Examples kept per pattern")
+    parser.add_argument("--context", type=int, default=40, help="Context chars around each example")
+    args = parser.parse_args()
+
+    audit = audit_chunks(iter_chunks(args.chunks), examples=args.examples, context=args.context)
+    print(f"=== PATTERN AUDIT: {audit.chunks} chunks, {audit.chars / 1e6:.1f}M chars ===")
+    audit.print()
+    if args.out:
+        audit.save(args.out)
+        print(f"\nReport saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Offline batch jobs in the Azure OpenAI Batch format.
+
+Pending requests are written to a JSONL file, one {custom_id, method, url, body}
+per line, and submitted to a backend. The job is polled until it finishes, and its
+output file is read back as {custom_id: response body}.
+
+  AzureBatch  files + batches API: its own quota, no TPM pacing, results within the
+              completion window (24h)
+  LocalBatch  runs the same file through a Python function, line by line, as a
+              stand-in for tests and dry runs
+
+Submitted job ids are recorded in the work directory until they are ingested, so
+a poller that dies does not lose a day-long job: resume_jobs() picks them up.
+
+Usage:
+    from batch_jobs import AzureBatch, chat_request, message_content, run_batch
+    reqs = [chat_request(key, DEPLOYMENT, messages, max_completion_tokens=4096) for ...]
+    bodies = run_batch(AzureBatch(client), reqs, work_dir)
+    content = message_content(bodies.get(key))
+"""
+import json, os, time, uuid
+
+BATCH_URL = "/chat/completions"
+MAX_REQUESTS = 50_000     # per batch file (Azure allows 100K requests / 200 MB)
+POLL_SECONDS = 60
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+JOBS_FILE = "pending_jobs.json"
+
+
+def chat_request(custom_id, model, messages, **params):
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_URL,
+        "body": {"model": model, "messages": messages, **params},
+    }
+
+
+def write_requests(path, requests):
+    with open(path, "w", encoding="utf-8") as f:
+        for r in requests:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+
+def read_results(lines):
+    """{custom_id: response body} from output/error file lines; None for failed requests."""
+    results = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        rec = json.loads(line)
+        resp = rec.get("response") or {}
+        results[rec["custom_id"]] = resp.get("body") if resp.get("status_code") == 200 else None
+    return results
+
+
+def message_content(body):
+    """Assistant text of a chat completion body, or None."""
+    try:
+        return body["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+class LocalBatch:
+    """Runs a batch file through handler(body) -> response body, in-process."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._outputs = {}
+
+    def submit(self, path):
+        job_id = f"local-{uuid.uuid4().hex[:12]}"
+        out = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                req = json.loads(line)
+                try:
+                    resp = {"status_code": 200, "body": self.handler(req["body"])}
+                    error = None
+                except Exception as e:
+                    resp = {"status_code": 500, "body": None}
+                    error = {"message": str(e)}
+                out.append(json.dumps({"custom_id": req["custom_id"], "response": resp, "error": error},
+                                      ensure_ascii=False))
+        self._outputs[job_id] = out
+        return job_id
+
+    def status(self, job_id):
+        return "completed" if job_id in self._outputs else "failed"
+
+    def output(self, job_id):
+        return self._outputs.pop(job_id, [])
+
+
+class AzureBatch:
+    """Azure OpenAI Batch API through a (sync) AzureOpenAI client."""
+
+    def __init__(self, client, completion_window="24h"):
+        self.client = client
+        self.completion_window = completion_window
+        self._jobs = {}
+
+    def submit(self, path):
+        with open(path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        job = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_URL,
+            completion_window=self.completion_window,
+        )
+        return job.id
+
+    def status(self, job_id):
+        job = self.client.batches.retrieve(job_id)
+        self._jobs[job_id] = job
+        return job.status
+
+    def output(self, job_id):
+        job = self._jobs.get(job_id) or self.client.batches.retrieve(job_id)
+        lines = []
+        for file_id in (job.output_file_id, job.error_file_id):
+            if file_id:
+                lines.extend(self.client.files.content(file_id).text.splitlines())
+        return lines
+
+
+def _load_jobs(work_dir):
+    try:
+        with open(os.path.join(work_dir, JOBS_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def _save_jobs(work_dir, jobs):
+    path = os.path.join(work_dir, JOBS_FILE)
+    if jobs:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(jobs, f)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def wait_for_jobs(backend, work_dir, poll=POLL_SECONDS, on_results=None):
+    """Poll the recorded jobs until all finish; returns {custom_id: body} of all of them.
+
+    on_results(results) is called as each job's output is read, before the job is
+    dropped from the record, so the caller can store results as they land.
+    """
+    results = {}
+    jobs = _load_jobs(work_dir)
+    while jobs:
+        for job_id in list(jobs):
+            status = backend.status(job_id)
+            if status not in FINAL_STATUSES:
+                continue
+            got = read_results(backend.output(job_id))
+            ok = sum(1 for b in got.values() if b is not None)
+            print(f"  Batch {job_id}: {status}, {ok}/{len(got)} ok")
+            if on_results:
+                on_results(got)
+            results.update(got)
+            jobs.remove(job_id)
+            _save_jobs(work_dir, jobs)
+        if jobs:
+            time.sleep(poll)
+    return results
+
+
+def resume_jobs(backend, work_dir, poll=POLL_SECONDS, on_results=None):
+    """Finish jobs submitted by an earlier run that stopped before ingesting them."""
+    if not _load_jobs(work_dir):
+        return {}
+    print(f"Resuming batch jobs recorded in {os.path.join(work_dir, JOBS_FILE)}")
+    return wait_for_jobs(backend, work_dir, poll, on_results)
+
+
+def run_batch(backend, requests, work_dir, poll=POLL_SECONDS, on_results=None):
+    """Submit requests in files of up to MAX_REQUESTS, wait, and return {custom_id: body}."""
+    os.makedirs(work_dir, exist_ok=True)
+    jobs = _load_jobs(work_dir)
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:6]}"
+    for n, start in enumerate(range(0, len(requests), MAX_REQUESTS)):
+        path = os.path.join(work_dir, f"batch_{stamp}_{n}.jsonl")
+        part = requests[start:start + MAX_REQUESTS]
+        write_requests(path, part)
+        job_id = backend.submit(path)
+        print(f"  Submitted {len(part)} requests as {job_id} ({path})")
+        jobs.append(job_id)
+        _save_jobs(work_dir, jobs)
+    return wait_for_jobs(backend, work_dir, poll, on_results)
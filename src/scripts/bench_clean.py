@@ -0,0 +1,122 @@
+"""
+Benchmark the fast cleaner (text_cleaner.clean_text) against the sequential re.sub
+chain it replaced, and check that both give byte-identical output.
+
+Usage:
+    python bench_clean.py                                   # normativa chunks, 3 rounds
+    python bench_clean.py --in ../../chunks/sentencias_chunks.json --rounds 5
+"""
+import re, time, argparse
+
+from chunk_io import iter_chunks
+from text_cleaner import HYPHEN, boilerplate_spans, clean_text
+
+IN_PATH = "/home/javier/rag-ss/chunks/normativa_chunks.json"
+
+
+# ── Previous implementation (clean_chunks_v2.py), kept verbatim as the reference ──
+def clean_text_legacy(text):
+    """Remove PDF headers, footers, and page numbers from extracted text."""
+
+    # Fix hyphenated line breaks FIRST: "word-\nrest" -> "wordrest"
+    # This must happen before header removal to avoid mid-word joins
+    text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)
+
+    # Pattern 1: Full header block (3-line: title + § ref + page num)
+    text = re.sub(
+        r'C[OÓ]DIGO LABORAL Y DE LA SEGURIDAD SOCIAL\n'
+        r'[^\n]*\n'                  # § reference line
+        r'(?:–\s*\d+\s*–\s*\n?)?',  # optional page number
+        '',
+        text
+    )
+
+    # Pattern 1b: Header with just page number (no § line)
+    text = re.sub(
+        r'C[OÓ]DIGO LABORAL Y DE LA SEGURIDAD SOCIAL\n'
+        r'(?:–\s*\d+\s*–\s*\n?)?',
+        '',
+        text
+    )
+
+    # Pattern 2: Standalone page numbers "– N –" (with OR without trailing newline)
+    text = re.sub(r'\n–\s*\d+\s*–\s*(?:\n|$)', '\n', text)
+    # Also at start of text
+    text = re.sub(r'^–\s*\d+\s*–\s*\n', '', text)
+
+    # Pattern 3: Alternative page number format "- N -"
+    text = re.sub(r'\n-\s*\d+\s*-\s*(?:\n|$)', '\n', text)
+
+    # Pattern 4: "Página N de N"
+    text = re.sub(r'\nP[aá]gina\s+\d+\s+de\s+\d+\s*(?:\n|$)', '\n', text)
+
+    # Pattern 5: BOE header block
+    text = re.sub(
+        r'BOLET[IÍ]N OFICIAL DEL ESTADO\n'
+        r'(?:N[uú]m\.\s*\d+[^\n]*\n)?'
+        r'(?:Sec\.\s*[IVX]+[^\n]*\n)?',
+        '',
+        text
+    )
+
+    # Pattern 6: CVE/verificable lines
+    text = re.sub(r'\n[Cc]ve:\s*BOE-[A-Z]-\d+-\d+[^\n]*(?:\n|$)', '\n', text)
+    text = re.sub(r'\nVerificable en https?://www\.boe\.es[^\n]*(?:\n|$)', '\n', text)
+
+    # Pattern 7: "[. . .]" markers (BOE omission markers, usually near page breaks)
+    # Only remove if on their own line
+    text = re.sub(r'\n\[\s*\.\s*\.\s*\.\s*\]\s*(?:\n|$)', '\n', text)
+
+    # Clean up: collapse multiple blank lines
+    text = re.sub(r'\n{3,}', '\n\n', text)
+
+    return text.strip()
+
+
+def time_cleaner(fn, texts, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        out = [fn(t) for t in texts]
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark clean_text against the legacy re.sub chain")
+    parser.add_argument("--in", dest="in_path", default=IN_PATH, help="Chunk file (.json or .jsonl)")
+    parser.add_argument("--rounds", type=int, default=3, help="Timing rounds (best is reported)")
+    parser.add_argument("--show", type=int, default=5, help="Mismatches to print")
+    args = parser.parse_args()
+
+    texts = [c["text"] for c in iter_chunks(args.in_path)]
+    total_chars = sum(len(t) for t in texts)
+    print(f"Loaded {len(texts)} chunks, {total_chars / 1e6:.1f}M chars")
+
+    t_legacy, legacy = time_cleaner(clean_text_legacy, texts, args.rounds)
+    t_fast, fast = time_cleaner(clean_text, texts, args.rounds)
+
+    print(f"\n=== TIMING (best of {args.rounds}) ===")
+    print(f"  legacy chain: {t_legacy:.3f}s  ({total_chars / t_legacy / 1e6:.2f}M chars/s)")
+    print(f"  fast:         {t_fast:.3f}s  ({total_chars / t_fast / 1e6:.2f}M chars/s)")
+    print(f"  speedup:      {t_legacy / t_fast:.2f}x")
+
+    fallbacks = sum(1 for t in texts if boilerplate_spans(HYPHEN.sub(r'\1\2', t)) is None)
+    print(f"  old chain used for {fallbacks} chunks (boilerplate not on lines of its own)")
+
+    mismatches = [i for i, (a, b) in enumerate(zip(legacy, fast)) if a != b]
+    print(f"\n=== OUTPUT ===")
+    if not mismatches:
+        print(f"  byte-identical on all {len(texts)} chunks ✓")
+    else:
+        print(f"  {len(mismatches)} chunks differ")
+    for i in mismatches[:args.show]:
+        a, b = legacy[i], fast[i]
+        k = next((k for k, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+        print(f"\n  chunk {i} at char {k}:")
+        print(f"    legacy: {a[max(0, k - 60):k + 60]!r}")
+        print(f"    fast:   {b[max(0, k - 60):k + 60]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark the single-pass article lexer (extract_chunks.split_law) against the
+previous regex splitter on the real PDF text, and report where their output differs.
+
+Usage:
+    python bench_extract.py                 # full PDF, 3 rounds
+    python bench_extract.py --rounds 10 --show 20
+"""
+import re, time, argparse
+
+from extract_chunks import PDF_PATH, SKIP_SECTIONS, find_laws, page_range, split_law
+from pdf_cache import open_pdf
+
+# ── Previous implementation, kept verbatim as the reference ──
+LEGACY_ART_PATTERN = re.compile(
+    r'\n(Art[ií]culo\s+\d+[a-z]?(?:\s+bis|\s+ter|\s+qu[aá]ter|\s+quinquies|\s+sexies|\s+septies|\s+octies)?\.\s*[^\n]*)\n'
+    r'|'
+    r'\n(Disposici[oó]n\s+(?:adicional|transitoria|derogatoria|final)\s+[^\n]*)\n',
+    re.IGNORECASE
+)
+
+
+def split_law_legacy(full_text, law):
+    chunks = []
+    law_title = law["title"]
+    splits = list(LEGACY_ART_PATTERN.finditer(full_text))
+
+    if not splits:
+        if len(full_text.strip()) > 100:
+            chunks.append({
+                "law": law_title,
+                "section": "Texto completo",
+                "text": full_text.strip()[:8000],
+                "pages": f"{law['start_page']}-{law['end_page']-1}"
+            })
+        return chunks
+
+    preamble = full_text[:splits[0].start()].strip()
+    if len(preamble) > 200:
+        chunks.append({
+            "law": law_title,
+            "section": "Preambulo / Exposicion de motivos",
+            "text": preamble[:8000],
+        })
+
+    for j, match in enumerate(splits):
+        art_title = (match.group(1) or match.group(2)).strip()
+        start_pos = match.start()
+        end_pos = splits[j + 1].start() if j + 1 < len(splits) else len(full_text)
+
+        text = full_text[start_pos:end_pos].strip()
+        text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)
+        text = re.sub(r'\n{3,}', '\n\n', text)
+
+        if len(text) < 50:
+            continue
+
+        if len(text) > 6000:
+            paragraphs = text.split('\n\n')
+            current_chunk = ""
+            part_num = 1
+            for para in paragraphs:
+                if len(current_chunk) + len(para) > 5500 and current_chunk:
+                    chunks.append({
+                        "law": law_title,
+                        "section": f"{art_title} (parte {part_num})",
+                        "text": current_chunk.strip(),
+                    })
+                    part_num += 1
+                    current_chunk = para + "\n\n"
+                else:
+                    current_chunk += para + "\n\n"
+            if current_chunk.strip():
+                suffix = f" (parte {part_num})" if part_num > 1 else ""
+                chunks.append({
+                    "law": law_title,
+                    "section": art_title + suffix,
+                    "text": current_chunk.strip(),
+                })
+        else:
+            chunks.append({
+                "law": law_title,
+                "section": art_title,
+                "text": text.strip(),
+            })
+
+    return chunks
+
+
+# Heading spellings the legacy IGNORECASE pattern split on; the lexer must split on
+# the capitalized ones too. The lowercase ones are cross-references (known false splits).
+HEADING_FORMS = [
+    "Artículo 5. Objeto", "ARTÍCULO 5. Objeto", "Artículo 5A. Objeto", "Artículo 12 Bis. Objeto",
+    "Artículo 12 bis. Objeto", "Disposición adicional primera. Plazos",
+    "Disposición Adicional primera. Plazos", "DISPOSICIÓN FINAL única. Entrada en vigor",
+    "artículo 45.1 del Estatuto", "disposición adicional segunda de la Ley",
+]
+
+
+def compare_heading_forms():
+    """Split one synthetic law per heading form with both splitters; returns the mismatches."""
+    law = {"title": "§ 1. Ley de prueba", "start_page": 1, "end_page": 2}
+    body = "Texto del precepto con contenido suficiente para formar un chunk propio.\n"
+    mismatches = []
+    for form in HEADING_FORMS:
+        text = f"Preámbulo.\nArtículo 1. Inicio\n{body}\n{form}\n{body}"
+        legacy = [c["section"] for c in split_law_legacy(text, law)]
+        lexer = [c["section"] for c in split_law(text, law)]
+        if legacy != lexer:
+            mismatches.append((form, legacy, lexer))
+    return mismatches
+
+
+def load_law_texts(pdf_path):
+    doc = open_pdf(pdf_path)
+    laws = find_laws(doc.get_toc(), len(doc))
+    texts = []
+    for law in laws:
+        if any(s in law["title"] for s in SKIP_SECTIONS):
+            continue
+        start_p, end_p = page_range(doc, law)
+        texts.append((law, "".join(t + "\n" for t in doc.page_texts(start_p, end_p))))
+    doc.close()
+    return texts
+
+
+def time_splitter(fn, texts, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        out = [c for law, text in texts for c in fn(text, law)]
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark split_law against the legacy regex splitter")
+    parser.add_argument("--pdf", default=PDF_PATH, help="PDF path")
+    parser.add_argument("--rounds", type=int, default=3, help="Timing rounds (best is reported)")
+    parser.add_argument("--show", type=int, default=10, help="Differences to print")
+    args = parser.parse_args()
+
+    print("=== HEADING FORMS ===")
+    mismatches = compare_heading_forms()
+    for form, legacy, lexer in mismatches:
+        print(f"  {form!r}: legacy {legacy} / lexer {lexer}")
+    unexpected = [form for form, _, _ in mismatches if form[:1].isupper()]
+    print(f"  {len(HEADING_FORMS) - len(mismatches)}/{len(HEADING_FORMS)} forms split the same, "
+          f"{len(unexpected)} capitalized forms differ\n")
+
+    print("Loading PDF text...")
+    texts = load_law_texts(args.pdf)
+    total_chars = sum(len(t) for _, t in texts)
+    print(f"{len(texts)} laws, {total_chars / 1e6:.1f}M chars")
+
+    t_legacy, legacy = time_splitter(split_law_legacy, texts, args.rounds)
+    t_lexer, lexer = time_splitter(split_law, texts, args.rounds)
+
+    print(f"\n=== TIMING (best of {args.rounds}) ===")
+    print(f"  legacy regex: {t_legacy:.3f}s  ({total_chars / t_legacy / 1e6:.1f}M chars/s)  {len(legacy)} chunks")
+    print(f"  lexer:        {t_lexer:.3f}s  ({total_chars / t_lexer / 1e6:.1f}M chars/s)  {len(lexer)} chunks")
+    print(f"  speedup:      {t_legacy / t_lexer:.2f}x")
+
+    # Compare by (law, section). Lowercase "artículo" sections are the known false
+    # splits of the IGNORECASE pattern; the lexer folds them back into their article.
+    legacy_keys = {(c["law"], c["section"]): c["text"] for c in legacy}
+    lexer_keys = {(c["law"], c["section"]): c["text"] for c in lexer}
+    only_legacy = [k for k in legacy_keys if k not in lexer_keys]
+    only_lexer = [k for k in lexer_keys if k not in legacy_keys]
+    false_splits = [k for k in only_legacy if not k[1][:1].isupper()]
+    changed = [k for k in legacy_keys if k in lexer_keys and legacy_keys[k] != lexer_keys[k]]
+
+    print("\n=== DIFFERENCES ===")
+    print(f"  sections only in legacy: {len(only_legacy)} ({len(false_splits)} lowercase false splits)")
+    print(f"  sections only in lexer:  {len(only_lexer)}")
+    print(f"  same section, new text:  {len(changed)}")
+    for law, section in only_legacy[:args.show]:
+        print(f"  - [{law[:40]}] {section[:70]!r}")
+    for law, section in only_lexer[:args.show]:
+        print(f"  + [{law[:40]}] {section[:70]!r}")
+    for law, section in changed[:args.show]:
+        print(f"  ~ [{law[:40]}] {section[:70]!r}")
+
+
+if __name__ == "__main__":
+    main()
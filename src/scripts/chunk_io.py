@@ -0,0 +1,106 @@
+"""
+Streaming helpers for chunk files.
+
+Chunks are stored either as a JSON array (normativa_chunks.json, indent=2) or as
+JSONL, one chunk per line, written while the producing stage is still running.
+
+Usage:
+    python chunk_io.py normativa_chunks.jsonl normativa_chunks.json   # JSONL -> JSON array
+"""
+import json, os, sys, time
+
+DONE_SUFFIX = ".done"  # marker written next to a JSONL file once its producer finishes
+
+
+class JsonlWriter:
+    """Append chunks to a JSONL file, flushing after every batch so readers can follow it."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        if os.path.exists(path + DONE_SUFFIX):
+            os.remove(path + DONE_SUFFIX)
+        self.f = open(path, "w", encoding="utf-8")
+
+    def write(self, chunks):
+        for c in chunks:
+            self.f.write(json.dumps(c, ensure_ascii=False) + "\n")
+        self.count += len(chunks)
+        self.f.flush()
+
+    def close(self, done=True):
+        self.f.close()
+        if done:  # tell followers the file is complete
+            open(self.path + DONE_SUFFIX, "w").close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # A producer that raised leaves no marker: the file is truncated, not final
+        self.close(done=exc[0] is None)
+
+
+def iter_jsonl(path, follow=False, poll=0.5):
+    """Yield chunks from a JSONL file.
+
+    With follow=True, keep reading as the producer appends lines and stop only
+    once its .done marker exists and the file is exhausted.
+    """
+    with open(path, encoding="utf-8") as f:
+        pending = ""
+        while True:
+            line = f.readline()
+            if line:
+                pending += line
+                if pending.endswith("\n"):  # otherwise the producer is mid-write
+                    if pending.strip():
+                        yield json.loads(pending)
+                    pending = ""
+                continue
+            if not follow:
+                break
+            if os.path.exists(path + DONE_SUFFIX):
+                follow = False  # drain whatever landed before the marker, then stop
+                continue
+            time.sleep(poll)
+        if pending.strip():
+            yield json.loads(pending)
+
+
+def iter_chunks(path, follow=False):
+    """Yield chunks from either a JSON array file or a JSONL file."""
+    if path.endswith(".jsonl"):
+        yield from iter_jsonl(path, follow=follow)
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def write_json_array(path, chunks):
+    """Stream chunks into a JSON array file.
+
+    Output is byte-identical to json.dump(list(chunks), f, ensure_ascii=False, indent=2),
+    but only one chunk is held in memory at a time.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for c in chunks:
+            body = json.dumps(c, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            f.write(("[\n  " if count == 0 else ",\n  ") + body)
+            count += 1
+        f.write("\n]" if count else "[]")
+    return count
+
+
+def jsonl_to_json(src, dst):
+    """Convert a JSONL chunk file into the classic indented JSON array."""
+    return write_json_array(dst, iter_jsonl(src))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python chunk_io.py <in.jsonl> <out.json>")
+        sys.exit(1)
+    n = jsonl_to_json(sys.argv[1], sys.argv[2])
+    print(f"Wrote {n} chunks to {sys.argv[2]}")
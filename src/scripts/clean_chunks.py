@@ -1,5 +1,7 @@
 import json, re, os
 
+from audit_patterns import audit_chunks
+
 IN_PATH = "/home/javier/rag-ss/chunks/normativa_chunks.json"
 OUT_PATH = "/home/javier/rag-ss/chunks/normativa_chunks_clean.json"
 
@@ -85,9 +87,9 @@ patterns = {
 }
 
 print("\n=== REMAINING PATTERNS ===")
-for name, pat in patterns.items():
-    count = sum(1 for c in cleaned_chunks if pat.search(c['text']))
-    print(f"  {name}: {count}/{len(cleaned_chunks)}")
+audit = audit_chunks(cleaned_chunks, patterns, examples=0)
+for name in patterns:
+    print(f"  {name}: {audit.stats[name]['chunks']}/{len(cleaned_chunks)}")
 
 # Stats
 text_lens = [len(c['text']) for c in cleaned_chunks]
@@ -1,87 +1,38 @@
-import json, re, os
+"""
+Remove PDF headers, footers and page numbers from chunk text.
+
+Chunks are streamed from a JSON array or a JSONL file, cleaned on a process pool
+and written back in input order as they come in, so the same stage runs on the
+normativa chunks and on the much larger sentencias corpus. JSONL input is never
+loaded whole; at most a few batches per worker are in flight. With --follow, a
+JSONL input is read while extract_chunks.py is still writing it, until its .done
+marker appears.
+
+Usage:
+    python clean_chunks_v2.py
+    python clean_chunks_v2.py --in sentencias_chunks.jsonl --out sentencias_chunks_clean.jsonl
+    python clean_chunks_v2.py --workers 1       # serial, no pool
+    python clean_chunks_v2.py --in normativa_chunks.jsonl --follow   # alongside extract_chunks.py
+    python clean_chunks_v2.py --audit clean_audit.json   # also save the remaining-patterns report
+"""
+import re, os, argparse, threading
+from multiprocessing import Pool
+
+from audit_patterns import PatternAudit
+from chunk_io import JsonlWriter, iter_chunks, write_json_array
+# One-scan version of the old re.sub chain, falling back to it when needed (see bench_clean.py)
+from text_cleaner import clean_text
 
 IN_PATH = "/home/javier/rag-ss/chunks/normativa_chunks.json"  # Start from original
 OUT_PATH = "/home/javier/rag-ss/chunks/normativa_chunks_clean.json"
 
-chunks = json.load(open(IN_PATH, encoding="utf-8"))
-print(f"Loaded {len(chunks)} chunks")
-
-def clean_text(text):
-    """Remove PDF headers, footers, and page numbers from extracted text."""
-    
-    # Fix hyphenated line breaks FIRST: "word-\nrest" -> "wordrest"
-    # This must happen before header removal to avoid mid-word joins
-    text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)
-    
-    # Pattern 1: Full header block (3-line: title + § ref + page num)
-    text = re.sub(
-        r'C[OÓ]DIGO LABORAL Y DE LA SEGURIDAD SOCIAL\n'
-        r'[^\n]*\n'                  # § reference line
-        r'(?:–\s*\d+\s*–\s*\n?)?',  # optional page number
-        '',
-        text
-    )
-    
-    # Pattern 1b: Header with just page number (no § line)
-    text = re.sub(
-        r'C[OÓ]DIGO LABORAL Y DE LA SEGURIDAD SOCIAL\n'
-        r'(?:–\s*\d+\s*–\s*\n?)?',
-        '',
-        text
-    )
-    
-    # Pattern 2: Standalone page numbers "– N –" (with OR without trailing newline)
-    text = re.sub(r'\n–\s*\d+\s*–\s*(?:\n|$)', '\n', text)
-    # Also at start of text
-    text = re.sub(r'^–\s*\d+\s*–\s*\n', '', text)
-    
-    # Pattern 3: Alternative page number format "- N -"
-    text = re.sub(r'\n-\s*\d+\s*-\s*(?:\n|$)', '\n', text)
-    
-    # Pattern 4: "Página N de N"
-    text = re.sub(r'\nP[aá]gina\s+\d+\s+de\s+\d+\s*(?:\n|$)', '\n', text)
-    
-    # Pattern 5: BOE header block
-    text = re.sub(
-        r'BOLET[IÍ]N OFICIAL DEL ESTADO\n'
-        r'(?:N[uú]m\.\s*\d+[^\n]*\n)?'
-        r'(?:Sec\.\s*[IVX]+[^\n]*\n)?',
-        '',
-        text
-    )
-    
-    # Pattern 6: CVE/verificable lines
-    text = re.sub(r'\n[Cc]ve:\s*BOE-[A-Z]-\d+-\d+[^\n]*(?:\n|$)', '\n', text)
-    text = re.sub(r'\nVerificable en https?://www\.boe\.es[^\n]*(?:\n|$)', '\n', text)
-    
-    # Pattern 7: "[. . .]" markers (BOE omission markers, usually near page breaks)
-    # Only remove if on their own line
-    text = re.sub(r'\n\[\s*\.\s*\.\s*\.\s*\]\s*(?:\n|$)', '\n', text)
-    
-    # Clean up: collapse multiple blank lines
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    return text.strip()
-
-
-# Apply cleaning
-cleaned_chunks = []
-total_removed_chars = 0
-
-for c in chunks:
-    original_len = len(c['text'])
-    cleaned = clean_text(c['text'])
-    total_removed_chars += original_len - len(cleaned)
-    
-    if len(cleaned) >= 30:
-        c['text'] = cleaned
-        cleaned_chunks.append(c)
-
-print(f"Chunks after cleaning: {len(cleaned_chunks)} (removed {len(chunks) - len(cleaned_chunks)} empty)")
-print(f"Total characters removed: {total_removed_chars:,}")
+MIN_CHARS = 30     # chunks shorter than this after cleaning are dropped
+BATCH_SIZE = 64    # chunks per pool task
+IN_FLIGHT = 4      # batches queued per worker before reading more input
+SAMPLE_AT = 100    # print 3 cleaned chunks from here on
 
 # Verify remaining patterns
-patterns = {
+PATTERNS = {
     "CODIGO LABORAL": re.compile(r'C[OÓ]DIGO LABORAL', re.IGNORECASE),
     "page_dash": re.compile(r'–\s*\d+\s*–'),
     "page_hyphen": re.compile(r'\n-\s*\d+\s*-'),
@@ -89,43 +40,154 @@ patterns = {
     "CVE-BOE": re.compile(r'cve.*BOE', re.IGNORECASE),
 }
 
-print("\n=== REMAINING PATTERNS ===")
-for name, pat in patterns.items():
-    count = sum(1 for c in cleaned_chunks if pat.search(c['text']))
-    if count > 0:
-        # Show first example
-        for c in cleaned_chunks:
-            m = pat.search(c['text'])
-            if m:
-                start = max(0, m.start() - 40)
-                end = min(len(c['text']), m.end() + 40)
-                ctx = c['text'][start:end].replace('\n', '\\n')
-                print(f"  {name}: {count} remaining — e.g. ...{ctx}...")
-                break
+
+def clean_batch(batch):
+    """Clean a batch of chunks.
+
+    Returns (kept chunks, chars removed, chunks dropped, PatternAudit of the kept text).
+    """
+    kept, removed, dropped = [], 0, 0
+    remaining = PatternAudit(PATTERNS, examples=1)
+    for c in batch:
+        cleaned = clean_text(c['text'])
+        removed += len(c['text']) - len(cleaned)
+        if len(cleaned) < MIN_CHARS:
+            dropped += 1
+            continue
+        c['text'] = cleaned
+        kept.append(c)
+        remaining.add(cleaned, label=c.get('section'))
+    return kept, removed, dropped, remaining
+
+
+def iter_batches(chunks, size, slots=None):
+    """Group chunks into lists of `size`; with slots, wait for a free one before each."""
+    batch = []
+    for c in chunks:
+        batch.append(c)
+        if len(batch) == size:
+            if slots:
+                slots.acquire()
+            yield batch
+            batch = []
+    if batch:
+        if slots:
+            slots.acquire()
+        yield batch
+
+
+def iter_cleaned(chunks, workers=1):
+    """Yield clean_batch() results in input order.
+
+    Pool.imap would pull the whole input in its feeder thread, so batches are
+    only handed out while fewer than IN_FLIGHT per worker are waiting.
+    """
+    if workers <= 1:
+        for batch in iter_batches(chunks, BATCH_SIZE):
+            yield clean_batch(batch)
+        return
+    slots = threading.Semaphore(workers * IN_FLIGHT)
+    with Pool(workers) as pool:
+        try:
+            for result in pool.imap(clean_batch, iter_batches(chunks, BATCH_SIZE, slots)):
+                slots.release()
+                yield result
+        finally:
+            slots.release(workers * IN_FLIGHT)  # never leave the feeder thread blocked
+
+
+class CleanStats:
+    """Counters for the summary printed at the end of a run."""
+
+    def __init__(self):
+        self.total = 0
+        self.dropped = 0
+        self.removed_chars = 0
+        self.remaining = PatternAudit(PATTERNS, examples=1)
+        self.text_lens = []
+        self.samples = []
+
+    def add(self, kept, removed, dropped, remaining):
+        for c in kept:
+            if SAMPLE_AT <= len(self.text_lens) < SAMPLE_AT + 3:
+                self.samples.append(c)
+            self.text_lens.append(len(c['text']))
+        self.total += len(kept) + dropped
+        self.dropped += dropped
+        self.removed_chars += removed
+        self.remaining.merge(remaining)
+
+    def print(self):
+        print(f"Loaded {self.total} chunks")
+        print(f"Chunks after cleaning: {len(self.text_lens)} (removed {self.dropped} empty)")
+        print(f"Total characters removed: {self.removed_chars:,}")
+
+        print("\n=== REMAINING PATTERNS ===")
+        for name in PATTERNS:
+            hit = self.remaining.stats[name]
+            if hit["chunks"]:
+                print(f"  {name}: {hit['chunks']} remaining "
+                      f"({hit['line_start']} at line start, {hit['mid_line']} mid-line) "
+                      f"— e.g. ...{hit['examples'][0]['context']}...")
+            else:
+                print(f"  {name}: 0 remaining ✓")
+
+        text_lens = self.text_lens
+        if not text_lens:
+            return
+        print(f"\n=== FINAL STATS ===")
+        print(f"Total chunks: {len(text_lens)}")
+        print(f"Avg size: {sum(text_lens)//len(text_lens)} chars")
+        print(f"Min: {min(text_lens)}, Max: {max(text_lens)}")
+        print(f"Median: {sorted(text_lens)[len(text_lens)//2]}")
+        print(f"< 100 chars: {sum(1 for l in text_lens if l < 100)}")
+        print(f"< 200 chars: {sum(1 for l in text_lens if l < 200)}")
+        print(f"> 5000 chars: {sum(1 for l in text_lens if l > 5000)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove PDF headers/footers from chunk text")
+    parser.add_argument("--in", dest="in_path", default=IN_PATH, help="Input chunks (.json or .jsonl)")
+    parser.add_argument("--out", default=OUT_PATH, help="Output chunks (.json or .jsonl)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Cleaning processes (default: all cores)")
+    parser.add_argument("--audit", help="Save the remaining-patterns report (JSON) here")
+    parser.add_argument("--follow", action="store_true",
+                        help="JSONL input still being written: wait for new lines until its .done marker")
+    args = parser.parse_args()
+    if args.follow and not args.in_path.endswith(".jsonl"):
+        parser.error("--follow needs a .jsonl input")
+
+    stats = CleanStats()
+
+    def cleaned_batches():
+        for kept, removed, dropped, remaining in iter_cleaned(iter_chunks(args.in_path, follow=args.follow), args.workers):
+            stats.add(kept, removed, dropped, remaining)
+            yield kept
+
+    # Save
+    if args.out.endswith(".jsonl"):
+        with JsonlWriter(args.out) as writer:
+            for kept in cleaned_batches():
+                writer.write(kept)
     else:
-        print(f"  {name}: 0 remaining ✓")
-
-# Stats
-text_lens = [len(c['text']) for c in cleaned_chunks]
-print(f"\n=== FINAL STATS ===")
-print(f"Total chunks: {len(cleaned_chunks)}")
-print(f"Avg size: {sum(text_lens)//len(text_lens)} chars")
-print(f"Min: {min(text_lens)}, Max: {max(text_lens)}")
-print(f"Median: {sorted(text_lens)[len(text_lens)//2]}")
-print(f"< 100 chars: {sum(1 for l in text_lens if l < 100)}")
-print(f"< 200 chars: {sum(1 for l in text_lens if l < 200)}")
-print(f"> 5000 chars: {sum(1 for l in text_lens if l > 5000)}")
-
-# Save
-with open(OUT_PATH, "w", encoding="utf-8") as f:
-    json.dump(cleaned_chunks, f, ensure_ascii=False, indent=2)
-print(f"\nSaved to {OUT_PATH}")
-print(f"File size: {os.path.getsize(OUT_PATH) / 1024 / 1024:.1f} MB")
-
-# Show 3 cleaned samples
-print("\n=== SAMPLE CLEANED CHUNKS ===")
-for c in cleaned_chunks[100:103]:
-    print(f"\n--- {c['law'][:65]}")
-    print(f"    {c['section'][:65]} [{len(c['text'])} chars] ---")
-    print(c['text'][:500])
-    print()
+        write_json_array(args.out, (c for kept in cleaned_batches() for c in kept))
+
+    stats.print()
+    if args.audit:
+        stats.remaining.save(args.audit)
+        print(f"Audit report saved to {args.audit}")
+    print(f"\nSaved to {args.out}")
+    print(f"File size: {os.path.getsize(args.out) / 1024 / 1024:.1f} MB")
+
+    # Show 3 cleaned samples
+    print("\n=== SAMPLE CLEANED CHUNKS ===")
+    for c in stats.samples:
+        print(f"\n--- {c.get('law', '')[:65]}")
+        print(f"    {c.get('section', '')[:65]} [{len(c['text'])} chars] ---")
+        print(c['text'][:500])
+        print()
+
+
+if __name__ == "__main__":
+    main()
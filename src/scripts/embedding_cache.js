@@ -0,0 +1,210 @@
+/**
+ * embedding_cache.js — Lector/escritor del almacén de embeddings de embedding_cache.py.
+ *
+ * Mismos ficheros que la versión Python (<modelo>-<dims>.npy + .idx en EMBEDDING_CACHE_DIR,
+ * por defecto <repo>/data/cache/embeddings en los dos). Los dos uploaders embeben
+ * embeddingInput(chunk) (embedding_input() en Python): un vector ya pagado desde
+ * upload_to_search.py no se vuelve a pedir aquí, y viceversa.
+ * La clave es el SHA-256 del texto normalizado (NFC, espacios colapsados, trim) — debe
+ * coincidir exactamente con normalize_text() de Python.
+ *
+ * Uso:
+ *   const { EmbeddingCache } = require('./embedding_cache');
+ *   const cache = new EmbeddingCache('text-embedding-3-small', 1536);
+ *   const vectors = await cache.embed(texts, embedBatch);   // embedBatch solo recibe los que faltan
+ *
+ * Al abrir y al añadir filas se toma <modelo>-<dims>.lock (creado en exclusiva, con el pid),
+ * el mismo cerrojo que usa Python, y antes de escribir se leen las filas que haya añadido
+ * el otro proceso: los dos uploaders pueden ejecutarse a la vez.
+ */
+
+const fs = require('fs');
+const path = require('path');
+const crypto = require('crypto');
+
+const CACHE_DIR = process.env.EMBEDDING_CACHE_DIR || path.join(__dirname, '..', '..', 'data', 'cache', 'embeddings'); // igual que en Python
+const HEADER_LEN = 128;
+const MAX_INPUT_CHARS = 30000; // el mismo corte que embedding_cache.py
+const LOCK_TIMEOUT_MS = 60000;
+const MAGIC = Buffer.from([0x93, 0x4e, 0x55, 0x4d, 0x50, 0x59, 0x01, 0x00]); // \x93NUMPY v1.0
+
+function normalizeText(text) {
+    return text.normalize('NFC').replace(/[ \t\n\r\f\v\u00a0]+/g, ' ').trim();
+}
+
+function textKey(text) {
+    return crypto.createHash('sha256').update(normalizeText(text), 'utf8').digest('hex');
+}
+
+// Texto que se embebe de un chunk de normativa en todos los uploaders: ley, sección y texto,
+// uno por línea, cortado a MAX_INPUT_CHARS caracteres (puntos de código, como en Python).
+// Debe coincidir con embedding_input() de embedding_cache.py.
+function embeddingInput(chunk) {
+    const full = [chunk.law, chunk.section, chunk.text].filter(Boolean).join('\n');
+    const chars = Array.from(full);
+    return chars.length > MAX_INPUT_CHARS ? chars.slice(0, MAX_INPUT_CHARS).join('') : full;
+}
+
+function sleepSync(ms) {
+    Atomics.wait(new Int32Array(new SharedArrayBuffer(4)), 0, 0, ms);
+}
+
+function lockIsStale(lockPath) {
+    let pid, age;
+    try {
+        pid = parseInt(fs.readFileSync(lockPath, 'ascii') || '0');
+        age = Date.now() - fs.statSync(lockPath).mtimeMs;
+    } catch (e) {
+        return false;
+    }
+    if (!pid) return age > 10000; // pid aún sin escribir, o su proceso murió justo al crearlo
+    try {
+        process.kill(pid, 0);
+        return false;
+    } catch (e) {
+        return e.code === 'ESRCH';
+    }
+}
+
+// Ejecuta fn con el cerrojo del almacén (mismo protocolo que store_lock() en Python)
+function withStoreLock(lockPath, fn) {
+    const deadline = Date.now() + LOCK_TIMEOUT_MS;
+    let fd;
+    for (;;) {
+        try {
+            fd = fs.openSync(lockPath, 'wx');
+            break;
+        } catch (e) {
+            if (e.code !== 'EEXIST') throw e;
+            if (lockIsStale(lockPath)) {
+                try { fs.unlinkSync(lockPath); } catch (e2) { /* ya lo quitó otro */ }
+                continue;
+            }
+            if (Date.now() > deadline) throw new Error(`${lockPath} ocupado más de ${LOCK_TIMEOUT_MS / 1000}s`);
+            sleepSync(50);
+        }
+    }
+    try {
+        fs.writeSync(fd, String(process.pid));
+        fs.closeSync(fd);
+        return fn();
+    } finally {
+        fs.unlinkSync(lockPath);
+    }
+}
+
+function header(rows, dims) {
+    const desc = `{'descr': '<f4', 'fortran_order': False, 'shape': (${rows}, ${dims}), }`;
+    const body = desc.padEnd(HEADER_LEN - MAGIC.length - 2 - 1) + '\n';
+    const len = Buffer.alloc(2);
+    len.writeUInt16LE(body.length);
+    return Buffer.concat([MAGIC, len, Buffer.from(body, 'latin1')]);
+}
+
+function readShape(fd, file) {
+    const head = Buffer.alloc(HEADER_LEN);
+    fs.readSync(fd, head, 0, HEADER_LEN, 0);
+    if (!head.subarray(0, 8).equals(MAGIC) || head.readUInt16LE(8) !== HEADER_LEN - 10) {
+        throw new Error(`${file}: no es un almacén de embeddings (.npy v1, cabecera de ${HEADER_LEN} bytes)`);
+    }
+    const desc = head.subarray(10).toString('latin1');
+    const m = desc.match(/'shape': \((\d+), (\d+)\)/);
+    if (!desc.includes("'<f4'") || !m) throw new Error(`${file}: se esperaba una matriz float32 little-endian`);
+    return [parseInt(m[1]), parseInt(m[2])];
+}
+
+class EmbeddingCache {
+    constructor(model, dims, cacheDir = CACHE_DIR) {
+        this.dims = dims;
+        this.rowBytes = 4 * dims;
+        this.hits = 0;
+        this.misses = 0;
+        fs.mkdirSync(cacheDir, { recursive: true });
+        this.npyPath = path.join(cacheDir, `${model}-${dims}.npy`);
+        this.idxPath = path.join(cacheDir, `${model}-${dims}.idx`);
+        this.lockPath = path.join(cacheDir, `${model}-${dims}.lock`);
+        this.rows = new Map();
+        this.count = 0;
+
+        withStoreLock(this.lockPath, () => {
+            if (!fs.existsSync(this.npyPath)) {
+                fs.writeFileSync(this.npyPath, header(0, dims));
+                fs.writeFileSync(this.idxPath, '');
+            }
+            this.fd = fs.openSync(this.npyPath, 'r+');
+            const [rows, fileDims] = readShape(this.fd, this.npyPath);
+            if (fileDims !== dims) throw new Error(`${this.npyPath} tiene vectores de ${fileDims} dims, no ${dims}`);
+            const keys = this.loadIndex();
+            // Filas escritas sin su línea de índice (corte entre ambas) se descartan
+            if (this.count !== rows || this.count !== keys.length) {
+                fs.writeFileSync(this.idxPath, keys.slice(0, this.count).map(k => k + '\n').join(''));
+                fs.ftruncateSync(this.fd, HEADER_LEN + this.count * this.rowBytes);
+                fs.writeSync(this.fd, header(this.count, dims), 0, HEADER_LEN, 0);
+            }
+        });
+    }
+
+    // Lee el número de filas y las líneas de índice a partir de this.count (lo que haya
+    // añadido el otro proceso); devuelve todas las claves del índice
+    loadIndex() {
+        const [rows] = readShape(this.fd, this.npyPath);
+        const keys = fs.readFileSync(this.idxPath, 'ascii').split('\n').filter(Boolean);
+        const count = Math.min(rows, keys.length);
+        for (let r = this.count; r < count; r++) if (!this.rows.has(keys[r])) this.rows.set(keys[r], r);
+        this.count = count;
+        return keys;
+    }
+
+    row(r) {
+        const buf = Buffer.alloc(this.rowBytes);
+        fs.readSync(this.fd, buf, 0, this.rowBytes, HEADER_LEN + r * this.rowBytes);
+        const out = new Array(this.dims);
+        for (let i = 0; i < this.dims; i++) out[i] = buf.readFloatLE(4 * i);
+        return out;
+    }
+
+    get(text) {
+        const r = this.rows.get(textKey(text));
+        return r === undefined ? null : this.row(r);
+    }
+
+    putMany(items) {
+        for (const [, vec] of items) {
+            if (vec.length !== this.dims) throw new Error(`vector de ${vec.length} dims para un almacén de ${this.dims}`);
+        }
+        withStoreLock(this.lockPath, () => {
+            this.loadIndex(); // el otro uploader puede haber añadido filas
+            const seen = new Set();
+            const fresh = items.filter(([k]) => !this.rows.has(k) && !seen.has(k) && seen.add(k));
+            if (!fresh.length) return;
+            const buf = Buffer.alloc(fresh.length * this.rowBytes);
+            fresh.forEach(([, vec], j) => vec.forEach((x, i) => buf.writeFloatLE(x, j * this.rowBytes + 4 * i)));
+            // Filas primero, índice después (ver embedding_cache.py)
+            fs.writeSync(this.fd, buf, 0, buf.length, HEADER_LEN + this.count * this.rowBytes);
+            fs.ftruncateSync(this.fd, HEADER_LEN + (this.count + fresh.length) * this.rowBytes);
+            fs.writeSync(this.fd, header(this.count + fresh.length, this.dims), 0, HEADER_LEN, 0);
+            fs.fsyncSync(this.fd);
+            fs.appendFileSync(this.idxPath, fresh.map(([k]) => k + '\n').join(''));
+            for (const [k] of fresh) this.rows.set(k, this.count++);
+        });
+    }
+
+    async embed(texts, embedFn) {
+        const keys = texts.map(textKey);
+        const todo = new Map();
+        keys.forEach((k, i) => { if (!this.rows.has(k) && !todo.has(k)) todo.set(k, texts[i]); });
+        if (todo.size) {
+            const vectors = await embedFn([...todo.values()]);
+            this.putMany([...todo.keys()].map((k, i) => [k, vectors[i]]));
+        }
+        this.misses += todo.size;
+        this.hits += keys.filter(k => !todo.has(k)).length;
+        return keys.map(k => this.row(this.rows.get(k)));
+    }
+
+    close() {
+        fs.closeSync(this.fd);
+    }
+}
+
+module.exports = { EmbeddingCache, embeddingInput, normalizeText, textKey };
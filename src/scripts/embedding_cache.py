@@ -0,0 +1,256 @@
+"""
+Content-addressed store of embeddings, shared by every uploader.
+
+One store per (model, dimensions) in CACHE_DIR:
+  <model>-<dims>.npy   float32 matrix, one row per text (standard .npy, so
+                       np.load(path, mmap_mode="r") reads it)
+  <model>-<dims>.idx   one SHA-256 per line, line n = row n
+
+The key is the hash of the normalized input text (NFC, whitespace runs collapsed
+to one space, stripped). A vector we already paid for is never requested again,
+whatever chunk, run or uploader it comes from. Identical texts in one batch are
+embedded once (the hundreds of "Derogado." articles). Both uploaders embed
+embedding_input(chunk) (embeddingInput in embedding_cache.js), so switching
+between Azure Search and Qdrant costs no embedding calls.
+
+The .npy header is written at a fixed HEADER_LEN, so appending rows only rewrites
+the row count in place. Rows are read through mmap. Rows are written before their
+index lines, so after a crash any rows without an index line are dropped on open.
+upload_to_qdrant.js reads and appends the same files (embedding_cache.js). Writers
+in either language take <model>-<dims>.lock (created exclusively, holding the pid)
+around opening and appending, and pick up rows the other appended before writing
+theirs, so the two uploaders can run at once.
+
+Usage:
+    from embedding_cache import EmbeddingCache
+    cache = EmbeddingCache("text-embedding-3-small", 1536)
+    vectors = await cache.embed(texts, embed_texts)   # embed_texts only gets the misses
+    cache.close()
+
+    python embedding_cache.py        # stores and row counts
+"""
+import ast, hashlib, mmap, os, re, struct, sys, time, unicodedata
+from array import array
+from contextlib import contextmanager
+
+# Same default as embedding_cache.js: <repo>/data/cache/embeddings
+CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "cache", "embeddings"))
+HEADER_LEN = 128   # bytes, fixed so the shape can be rewritten in place
+MAGIC = b"\x93NUMPY\x01\x00"
+MAX_INPUT_CHARS = 30000  # same cut as embedding_cache.js
+LOCK_TIMEOUT = 60  # seconds waiting for the other writer
+
+_SPACES = re.compile(r"[ \t\n\r\f\v\u00a0]+")  # same class as embedding_cache.js
+
+
+def normalize_text(text):
+    return _SPACES.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_key(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def embedding_input(chunk):
+    """Text embedded for a normativa chunk by every uploader: law, section and text,
+    one per line, cut to MAX_INPUT_CHARS. Must match embeddingInput() in embedding_cache.js."""
+    full = "\n".join(part for part in (chunk.get("law"), chunk.get("section"), chunk.get("text")) if part)
+    return full[:MAX_INPUT_CHARS]
+
+
+def _lock_is_stale(path):
+    try:
+        with open(path, encoding="ascii") as f:
+            pid = int(f.read() or 0)
+        age = time.time() - os.path.getmtime(path)
+    except (FileNotFoundError, ValueError):
+        return False
+    if not pid:
+        return age > 10  # pid not written yet, or its writer died right after creating it
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+@contextmanager
+def store_lock(path, timeout=LOCK_TIMEOUT):
+    """Hold path exclusively, the same way embedding_cache.js does (O_EXCL file with
+    the pid). A lock left by a process that no longer exists is taken over."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if _lock_is_stale(path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{path} held for more than {timeout}s")
+            time.sleep(0.05)
+    try:
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        os.close(fd)
+        yield
+    finally:
+        os.remove(path)
+
+
+def _header(rows, dims):
+    desc = f"{{'descr': '<f4', 'fortran_order': False, 'shape': ({rows}, {dims}), }}"
+    body = desc.ljust(HEADER_LEN - len(MAGIC) - 2 - 1) + "\n"
+    return MAGIC + struct.pack("<H", len(body)) + body.encode("latin1")
+
+
+def _read_shape(f):
+    head = f.read(HEADER_LEN)
+    if head[:8] != MAGIC or struct.unpack("<H", head[8:10])[0] != HEADER_LEN - 10:
+        raise ValueError(f"{f.name}: not an embedding store (.npy v1, {HEADER_LEN}-byte header)")
+    desc = ast.literal_eval(head[10:].decode("latin1").strip())
+    if desc["descr"] != "<f4" or desc["fortran_order"]:
+        raise ValueError(f"{f.name}: expected a C-order little-endian float32 matrix")
+    return desc["shape"]
+
+
+class EmbeddingCache:
+    """Vectors of one (model, dimensions) by text_key."""
+
+    def __init__(self, model, dims, cache_dir=CACHE_DIR):
+        self.model = model
+        self.dims = dims
+        self.row_bytes = 4 * dims
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        stem = os.path.join(cache_dir, f"{model}-{dims}")
+        self.npy_path = stem + ".npy"
+        self.idx_path = stem + ".idx"
+        self.lock_path = stem + ".lock"
+        self.rows = {}
+        self.count = 0
+        self._map = None
+
+        with store_lock(self.lock_path):
+            if not os.path.exists(self.npy_path):
+                with open(self.npy_path, "wb") as f:
+                    f.write(_header(0, dims))
+                open(self.idx_path, "w").close()
+            self._npy = open(self.npy_path, "r+b")
+            rows, file_dims = _read_shape(self._npy)
+            if file_dims != dims:
+                raise ValueError(f"{self.npy_path} holds {file_dims}-dim vectors, not {dims}")
+            keys = self._load_index()
+            # Rows written without their index line (a crash in between) are dropped
+            if self.count != rows or self.count != len(keys):
+                self._rewrite_index(keys[:self.count])
+                self._set_count(self.count)
+
+    def _load_index(self):
+        """Read the row count and index lines past self.count (rows another writer
+        appended since); returns all index keys."""
+        self._npy.seek(0)
+        rows, _ = _read_shape(self._npy)
+        with open(self.idx_path, encoding="ascii") as f:
+            keys = [line.strip() for line in f if line.strip()]
+        count = min(rows, len(keys))
+        for r in range(self.count, count):
+            self.rows.setdefault(keys[r], r)
+        self.count = count
+        return keys
+
+    def _rewrite_index(self, keys):
+        with open(self.idx_path, "w", encoding="ascii") as f:
+            for key in keys:
+                f.write(key + "\n")
+
+    def _set_count(self, count):
+        self._npy.truncate(HEADER_LEN + count * self.row_bytes)
+        self._npy.seek(0)
+        self._npy.write(_header(count, self.dims))
+        self._npy.flush()
+
+    def _row(self, r):
+        if self._map is None:
+            self._map = mmap.mmap(self._npy.fileno(), 0, access=mmap.ACCESS_READ)
+        start = HEADER_LEN + r * self.row_bytes
+        vec = array("f")
+        vec.frombytes(self._map[start:start + self.row_bytes])
+        if sys.byteorder == "big":
+            vec.byteswap()
+        return vec.tolist()
+
+    def get(self, text):
+        r = self.rows.get(text_key(text))
+        return None if r is None else self._row(r)
+
+    def put_many(self, items):
+        """Store [(key, vector)]; keys already stored are skipped."""
+        items = dict(items)
+        for vec in items.values():
+            if len(vec) != self.dims:
+                raise ValueError(f"got a {len(vec)}-dim vector for a {self.dims}-dim store")
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        with store_lock(self.lock_path):
+            self._load_index()  # the other uploader may have appended since
+            new = [(k, v) for k, v in items.items() if k not in self.rows]
+            if not new:
+                return
+            data = array("f")
+            for _, vec in new:
+                data.extend(vec)
+            if sys.byteorder == "big":
+                data.byteswap()
+            self._npy.seek(HEADER_LEN + self.count * self.row_bytes)
+            self._npy.write(data.tobytes())
+            self._set_count(self.count + len(new))
+            os.fsync(self._npy.fileno())
+            with open(self.idx_path, "a", encoding="ascii") as f:
+                for key, _ in new:
+                    self.rows[key] = self.count
+                    self.count += 1
+                    f.write(key + "\n")
+
+    async def embed(self, texts, embed_fn):
+        """Vectors for texts, calling await embed_fn(list) once for the distinct misses."""
+        keys = [text_key(t) for t in texts]
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in self.rows and key not in todo:
+                todo[key] = text
+        if todo:
+            vectors = await embed_fn(list(todo.values()))
+            self.put_many(zip(todo.keys(), vectors))
+        # Counted once the batch is through, so a failed call that is retried counts once
+        self.misses += len(todo)
+        self.hits += len(keys) - sum(1 for k in keys if k in todo)
+        return [self._row(self.rows[k]) for k in keys]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._npy is not None:
+            self._npy.close()
+            self._npy = None
+
+
+if __name__ == "__main__":
+    if not os.path.isdir(CACHE_DIR):
+        print(f"No embedding cache at {CACHE_DIR}")
+        sys.exit(0)
+    for name in sorted(os.listdir(CACHE_DIR)):
+        if name.endswith(".npy"):
+            path = os.path.join(CACHE_DIR, name)
+            with open(path, "rb") as f:
+                rows, dims = _read_shape(f)
+            print(f"  {name}: {rows} vectors x {dims} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
@@ -1,74 +1,19 @@
-import fitz, json, re, os
+import json, re, os
+from bisect import bisect_left
+
+from toc_tree import TREE_PATH, load_or_build
 
 PDF_PATH = "/home/javier/rag-ss/pdfs/normativa/CODIGO_Laboral_y_SS_BOE.pdf"
 IN_PATH = "/home/javier/rag-ss/chunks/normativa_chunks_clean.json"
 OUT_PATH = "/home/javier/rag-ss/chunks/normativa_chunks_v2.json"
 
-# ── Step 1: Load PDF TOC and build hierarchy map ──
-doc = fitz.open(PDF_PATH)
-toc = doc.get_toc()
-doc.close()
-
-SECTION_SIGN = "\u00A7"  # §
-
-# Build hierarchy: for each L3 article entry, find its L2 ancestors
+# ── Step 1: Load the TOC tree (saved by extract_chunks.py, built from the PDF if missing) ──
 # TOC structure: L1 = law (§ N. name), L2 = TÍTULO/CAPÍTULO/Sección, L3 = article
+tree = load_or_build(TREE_PATH, PDF_PATH)
 
-# First, build a map of all TOC entries with their hierarchy context
-# For each TOC entry, walk backwards to find parent L2 and L1 entries
-toc_hierarchy = {}  # key = (law_title_raw, article_title_normalized) -> chapter_path
-
-current_l1 = ""
-current_l2_stack = []  # stack of L2 entries (reset on new L1)
+SECTION_SIGN = "\u00A7"  # §
 
-for i, (level, title, page) in enumerate(toc):
-    title = title.strip()
-    
-    if level == 1:
-        current_l1 = title
-        current_l2_stack = []
-    elif level == 2:
-        # L2 might be nested (TÍTULO > CAPÍTULO > Sección)
-        # Reset deeper levels when we see a new one at same or higher structural level
-        # Simple approach: just track the stack
-        
-        # Determine structural depth of this L2 entry
-        # Hierarchy order: LIBRO > TÍTULO > CAPÍTULO > SUBSECCIÓN > SECCIÓN
-        t_upper = title.upper()
-        if any(t_upper.startswith(x) for x in ['LIBRO']):
-            current_l2_stack = [title]  # Reset everything
-        elif any(t_upper.startswith(x) for x in ['TÍTULO', 'TITULO']):
-            # Keep LIBRO, reset everything else
-            current_l2_stack = [s for s in current_l2_stack 
-                               if s.upper().startswith(('LIBRO',))]
-            current_l2_stack.append(title)
-        elif any(t_upper.startswith(x) for x in ['CAPÍTULO', 'CAPITULO', 'CAP.']):
-            # Keep LIBRO + TÍTULO, reset CAPÍTULO and below
-            current_l2_stack = [s for s in current_l2_stack 
-                               if s.upper().startswith(('LIBRO', 'TÍTULO', 'TITULO'))]
-            current_l2_stack.append(title)
-        elif any(t_upper.startswith(x) for x in ['SUBSECCIÓN', 'SUBSECCION']):
-            # Keep LIBRO + TÍTULO + CAPÍTULO, reset SUBSECCIÓN and below
-            current_l2_stack = [s for s in current_l2_stack 
-                               if s.upper().startswith(('LIBRO', 'TÍTULO', 'TITULO', 'CAPÍTULO', 'CAPITULO', 'CAP.'))]
-            current_l2_stack.append(title)
-        elif any(t_upper.startswith(x) for x in ['SECCIÓN', 'SECCION', 'SECC.']):
-            # Keep everything above SECCIÓN
-            current_l2_stack = [s for s in current_l2_stack 
-                               if not s.upper().startswith(('SECCIÓN', 'SECCION', 'SECC.'))]
-            current_l2_stack.append(title)
-        else:
-            # Other L2 entries (e.g., "Disposiciones adicionales")
-            current_l2_stack = [s for s in current_l2_stack 
-                               if s.upper().startswith(('LIBRO', 'TÍTULO', 'TITULO'))]
-            current_l2_stack.append(title)
-    elif level == 3:
-        # Article entry - store its hierarchy
-        # Normalize the title for matching
-        art_norm = re.sub(r'\s+', ' ', title).strip()
-        key = (current_l1, art_norm)
-        chapter_path = " > ".join(current_l2_stack) if current_l2_stack else ""
-        toc_hierarchy[key] = chapter_path
+toc_hierarchy = tree.article_paths()  # key = (law_title_raw, article_title_normalized) -> chapter_path
 
 print(f"TOC hierarchy entries: {len(toc_hierarchy)}")
 
@@ -78,6 +23,45 @@ for (law, art), path in examples:
     print(f"  [{law[:50]}] {art[:40]} -> {path[:60]}")
 
 
+class PrefixIndex:
+    """One law's article titles, sorted, for "first TOC entry starting with prefix".
+
+    bisect finds the block of titles sharing the prefix and a sparse table of
+    their TOC positions gives the earliest one, so a lookup returns the same
+    entry a scan in TOC order would, in O(log n).
+    """
+
+    def __init__(self, entries):
+        entries = sorted(entries)  # (title, toc position)
+        self.titles = [t for t, _ in entries]
+        level = [pos for _, pos in entries]
+        self.table = [level]  # table[j][i] = min TOC position of titles[i:i + 2**j]
+        span = 1
+        while 2 * span <= len(entries):
+            level = [min(a, b) for a, b in zip(level, level[span:])]
+            self.table.append(level)
+            span *= 2
+
+    def first(self, prefix):
+        """TOC position of the earliest title starting with prefix, or None."""
+        lo = bisect_left(self.titles, prefix)
+        hi = bisect_left(self.titles, prefix + "\U0010ffff", lo)
+        if lo == hi:
+            return None
+        j = (hi - lo).bit_length() - 1
+        return min(self.table[j][lo], self.table[j][hi - (1 << j)])
+
+
+# Per-law indexes for the fuzzy fallbacks in find_chapter (lowercased for Disposiciones)
+toc_keys = list(toc_hierarchy)  # TOC order, which decides ties between prefix matches
+art_entries, disp_entries = {}, {}
+for pos, (law, art) in enumerate(toc_keys):
+    art_entries.setdefault(law, []).append((art, pos))
+    disp_entries.setdefault(law, []).append((art.lower(), pos))
+art_index = {law: PrefixIndex(e) for law, e in art_entries.items()}
+disp_index = {law: PrefixIndex(e) for law, e in disp_entries.items()}
+
+
 # ── Step 2: Load chunks and enhance ──
 chunks = json.load(open(IN_PATH, encoding="utf-8"))
 print(f"\nLoaded {len(chunks)} chunks")
@@ -122,19 +106,17 @@ def find_chapter(law_raw, section):
     
     # Try fuzzy match: just the article number
     art_match = re.match(r'(Art[ií]culo\s+\d+[a-z]?(?:\s+bis|\s+ter|\s+qu[aá]ter)?\.)', sec_norm)
-    if art_match:
-        art_prefix = art_match.group(1)
-        for (law_key, art_key), path in toc_hierarchy.items():
-            if law_key == law_raw and art_key.startswith(art_prefix):
-                return path
+    if art_match and law_raw in art_index:
+        pos = art_index[law_raw].first(art_match.group(1))
+        if pos is not None:
+            return toc_hierarchy[toc_keys[pos]]
     
     # Try matching Disposiciones
     disp_match = re.match(r'(Disposici[oó]n\s+\w+\s+\w+)', sec_norm, re.IGNORECASE)
-    if disp_match:
-        disp_prefix = disp_match.group(1).lower()
-        for (law_key, art_key), path in toc_hierarchy.items():
-            if law_key == law_raw and art_key.lower().startswith(disp_prefix):
-                return path
+    if disp_match and law_raw in disp_index:
+        pos = disp_index[law_raw].first(disp_match.group(1).lower())
+        if pos is not None:
+            return toc_hierarchy[toc_keys[pos]]
     
     return ""
 
@@ -142,6 +124,7 @@ def find_chapter(law_raw, section):
 # Process all chunks
 enhanced = []
 matched = 0
+matched_by_page = 0
 unmatched_examples = []
 
 for c in chunks:
@@ -151,6 +134,11 @@ for c in chunks:
     text_clean = clean_text(c['text'])
     
     chapter = find_chapter(law_raw, section)
+    if not chapter and 'page' in c and section != "Preambulo / Exposicion de motivos":
+        # No TOC title matched: take the chapter of the page the chunk's heading is on
+        chapter = tree.path_at(law_raw, c['page'])
+        if chapter:
+            matched_by_page += 1
     if chapter:
         matched += 1
     elif section != "Preambulo / Exposicion de motivos" and section != "Texto completo":
@@ -165,9 +153,12 @@ for c in chunks:
     }
     if 'pages' in c:
         chunk['pages'] = c['pages']
+    if 'page' in c:
+        chunk['page'] = c['page']
     enhanced.append(chunk)
 
 print(f"\nChapter matched: {matched}/{len(chunks)} ({matched*100//len(chunks)}%)")
+print(f"  by page position: {matched_by_page}")
 if unmatched_examples:
     print(f"Unmatched examples:")
     for ex in unmatched_examples:
@@ -0,0 +1,116 @@
+"""
+Persistent cache of LLM enrichment results, keyed by what was asked.
+
+The key is the SHA-256 of (model, system prompt, rendered user prompt), so a result
+stays valid wherever its chunk ends up after a recut or reorder. It is invalidated
+only when the prompt text itself changes, e.g. new chunk text, law, chapter or
+instructions. Metadata that does not reach the prompt does not matter.
+
+It is also the checkpoint log of a run. Each result is inserted once, and inserts
+are committed in small groups (COMMIT_EVERY results or COMMIT_SECONDS). In WAL mode
+with synchronous=FULL that means one fsync per group, and a crash loses at most the
+last group, never the file. Resuming is just looking the prompts up again.
+
+Usage:
+    from enrich_cache import EnrichCache, prompt_key
+    cache = EnrichCache()
+    key = prompt_key(DEPLOYMENT, SYSTEM_PROMPT, build_prompt(chunk))
+    result = cache.get(key)
+    if result is None:
+        result = ...  # call the API
+        cache.put(key, DEPLOYMENT, result)
+    cache.close()                     # commits the last group
+
+    python enrich_cache.py            # entries per model
+"""
+import hashlib, json, os, sqlite3, time
+
+CACHE_PATH = "/home/javier/rag-ss/cache/enrichment.sqlite"
+COMMIT_EVERY = 20     # results per commit (fsync)...
+COMMIT_SECONDS = 5.0  # ...or fewer, if this long has passed since the last one
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS enrichments (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    result TEXT,
+    created REAL
+);
+"""
+
+
+def prompt_key(model, system_prompt, user_prompt):
+    payload = json.dumps([model, system_prompt, user_prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EnrichCache:
+    """Parsed enrichment results by prompt_key, in one SQLite file."""
+
+    def __init__(self, path=CACHE_PATH, commit_every=COMMIT_EVERY, commit_seconds=COMMIT_SECONDS):
+        self.path = path
+        self.commit_every = commit_every
+        self.commit_seconds = commit_seconds
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Not tied to the opening thread: enrich_chunks writes checkpoints from a worker
+        # thread, one call at a time
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")  # every commit is fsync'd; commits are grouped
+        self._db.executescript(SCHEMA)
+
+    def __contains__(self, key):
+        return self._db.execute("SELECT 1 FROM enrichments WHERE key = ?", (key,)).fetchone() is not None
+
+    def get(self, key):
+        row = self._db.execute("SELECT result FROM enrichments WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, model, result):
+        self._db.execute(
+            "INSERT OR REPLACE INTO enrichments (key, model, result, created) VALUES (?, ?, ?, ?)",
+            (key, model, json.dumps(result, ensure_ascii=False), time.time()))
+        self._pending += 1
+        if self._pending >= self.commit_every or time.monotonic() - self._last_commit >= self.commit_seconds:
+            self.flush()
+
+    def put_many(self, model, rows):
+        """Insert [(key, result)] and commit them as one group."""
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO enrichments (key, model, result, created) VALUES (?, ?, ?, ?)",
+            [(key, model, json.dumps(result, ensure_ascii=False), now) for key, result in rows])
+        self._pending += len(rows)
+        self.flush()
+
+    def flush(self):
+        """Commit the results inserted since the last commit."""
+        if self._pending:
+            self._db.commit()
+            self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def counts(self):
+        return dict(self._db.execute("SELECT model, COUNT(*) FROM enrichments GROUP BY model"))
+
+    def close(self):
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+
+if __name__ == "__main__":
+    cache = EnrichCache()
+    for model, n in sorted(cache.counts().items()):
+        print(f"  {model}: {n} cached results")
+    print(f"Cache: {CACHE_PATH} ({os.path.getsize(CACHE_PATH) / 1024 / 1024:.1f} MB)")
+    cache.close()
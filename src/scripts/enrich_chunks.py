@@ -1,24 +1,97 @@
 """
 Enrich normativa chunks with GPT-5 Nano using async concurrency.
-Saves progress every 50 chunks. Resumable.
+Every result is stored in the enrichment cache (enrich_cache.py) as it arrives,
+keyed by the prompt rather than the chunk index. The cache doubles as the
+checkpoint log: runs resume by replaying it, and after a recut only chunks whose
+prompt changed are sent again. The output is streamed from the input file and
+the cache. The results of the old index-keyed enrichment_progress.json can be
+imported into the cache once with --import-progress, before recutting.
+
+Concurrency adapts to the endpoint (rate_control.AimdLimiter): it grows while
+requests succeed and is halved, with a pause for every request, on a 429.
+Requests are paced against the deployment's TPM quota (rate_control.TokenBucket).
+Each one reserves its prompt tokens plus the average completion so far, and the
+reservation is settled with the real usage.
+
+Requests come from a queue served by long-lived workers, more of them than the
+limiter allows in flight, so a slow or retrying request never holds the others
+back. A separate checkpoint task writes the results to the cache in groups of
+SAVE_EVERY or every CHECKPOINT_SECONDS, off the event loop.
+
+With --pack, short chunks of the same law share one request (up to PACK_TOKENS of
+text): the model returns a JSON array keyed by chunk id, and each entry is checked
+and cached under pack_key(), the hash of the chunk rendered in the pack prompt.
+Chunks whose entry is missing or invalid are sent again on their own. Every run
+falls back to a chunk's packed answer when it has no single-chunk one, so a later
+run without --pack does not pay for those chunks again.
+
+With --stream, single-chunk answers are streamed and checked as they arrive
+(json_stream.JsonStream). A request is cancelled as soon as its answer cannot
+become a valid enrichment, instead of paying for the whole completion before a
+retry. An answer cut off at max_completion_tokens is repaired locally when only
+its tail is missing.
+
+Every live API call is recorded in telemetry.py with its outcome, queue wait,
+latency, first-token time (streamed), and prompt, completion and reasoning tokens.
+Retries, throttle pauses and parse failures are recorded too. The report is
+written at each progress line as TELEMETRY_PATH (JSON) and PROM_PATH (Prometheus
+text, for the node_exporter textfile collector). It is labelled with the model
+and PROMPT_VERSION, a hash of the prompt templates.
+
+Usage:
+    python enrich_chunks.py                  # live requests
+    python enrich_chunks.py --pack           # live, short chunks packed several per request
+    python enrich_chunks.py --stream         # live, answers streamed and checked as they arrive
+    python enrich_chunks.py --batch azure    # one offline Azure OpenAI batch job (batch_jobs.py)
+    python enrich_chunks.py --batch local    # dry run: same batch file, answered offline, nothing stored
+    python enrich_chunks.py --import-progress    # import enrichment_progress.json first
 """
-import json, os, time, re, asyncio
-from openai import AsyncAzureOpenAI
+import json, os, time, re, asyncio, argparse
+from collections import deque
+from openai import AsyncAzureOpenAI, AzureOpenAI, RateLimitError
+
+from batch_jobs import AzureBatch, LocalBatch, chat_request, message_content, resume_jobs, run_batch
+from chunk_io import iter_chunks, write_json_array
+from enrich_cache import EnrichCache, prompt_key
+from json_stream import JsonStream
+from telemetry import Telemetry, print_report
+from rate_control import AimdLimiter, TokenBucket, chat_tokens, count_tokens
 
 # ── Config (from environment variables) ──
 ENDPOINT = os.getenv("AZURE_OPENAI_READER_ENDPOINT", "https://openai-reader-javi.cognitiveservices.azure.com/")
 API_KEY = os.environ["AZURE_OPENAI_READER_KEY"]  # Required
 DEPLOYMENT = "gpt-5-nano"
+BATCH_DEPLOYMENT = os.getenv("AZURE_OPENAI_BATCH_DEPLOYMENT", DEPLOYMENT)  # a Global Batch deployment
 API_VERSION = "2024-12-01-preview"
 
 IN_PATH = "/home/javier/rag-ss/chunks/normativa_chunks_v2.json"
 OUT_PATH = "/home/javier/rag-ss/chunks/normativa_chunks_enriched.json"
-PROGRESS_PATH = "/home/javier/rag-ss/chunks/enrichment_progress.json"
+PROGRESS_PATH = "/home/javier/rag-ss/chunks/enrichment_progress.json"  # old index-keyed checkpoint
+BATCH_DIR = "/home/javier/rag-ss/chunks/enrich_batches"  # batch input files + pending job ids
+TELEMETRY_PATH = "/home/javier/rag-ss/chunks/enrich_telemetry.json"
+PROM_PATH = "/home/javier/rag-ss/chunks/enrich_telemetry.prom"
 
 MAX_TEXT_CHARS = 2000
-MAX_RETRIES = 3
-SAVE_EVERY = 50
-CONCURRENCY = 5  # parallel requests
+MAX_RETRIES = 3            # failed or unparseable responses per chunk
+MAX_THROTTLE_RETRIES = 10  # 429s per chunk (they do not use up MAX_RETRIES)
+SAVE_EVERY = 50       # chunks per progress report and checkpoint commit...
+CHECKPOINT_SECONDS = 5.0  # ...or fewer, if this long has passed since the last one
+CONCURRENCY = 5       # parallel requests to start with...
+MAX_CONCURRENCY = 32  # ...and the most the limiter will grow to
+WORKERS = 2 * MAX_CONCURRENCY  # spares keep the limiter full while others sleep between retries
+TPM = 100_000         # gpt-5-nano quota on the Reader endpoint (docs/rag-pipeline-stages.md)
+EXPECTED_OUTPUT = 1500  # completion tokens reserved per chunk until real usage comes in
+SMALL_CHUNK_TOKENS = 300  # --pack: chunks up to this size are packed...
+PACK_TOKENS = 2000        # ...up to this much chunk text per request...
+PACK_MAX = 8              # ...and at most this many chunks
+PACK_COMPLETION_TOKENS = 12000
+
+recent_outputs = deque(maxlen=50)  # completion tokens per chunk of the last answered requests
+stream_stats = {"cancelled": 0, "repaired": 0}  # --stream: answers stopped early / fixed locally
+
+# Chunks under 60 chars are derogated-article stubs: no request needed
+DEROGATED = {"resumen": "Artículo derogado.", "palabras_clave": [], "preguntas": []}
+ENRICHMENT_SCHEMA = {"resumen": str, "palabras_clave": list, "preguntas": list}
 
 SYSTEM_PROMPT = """Eres un experto en legislación laboral y de Seguridad Social española.
 Responde SIEMPRE con JSON válido, sin texto adicional ni bloques de código markdown."""
@@ -41,14 +114,84 @@ TEXTO:
 Responde SOLO con JSON válido."""
 
 
-def parse_response(content):
-    if not content:
-        return None
+def build_pack_prompt(pack):
+    parts = []
+    for idx, chunk in pack:
+        parts.append(f"""### id: {idx}
+CAPÍTULO: {chunk.get('chapter', '')}
+SECCIÓN: {chunk['section']}
+TEXTO:
+{chunk['text'][:MAX_TEXT_CHARS]}""")
+    fragments = "\n\n".join(parts)
+    return f"""Analiza estos {len(pack)} fragmentos de legislación y devuelve un array JSON con un objeto por fragmento, en el mismo orden, cada uno con:
+- "id": el id del fragmento (número tras "### id:").
+- "resumen": Resumen de 1-2 frases en español llano explicando qué regula.
+- "palabras_clave": Lista de 5-8 conceptos clave para búsqueda semántica.
+- "preguntas": Lista de 3-4 preguntas que este artículo respondería, formuladas como las haría un ciudadano o profesional de RRHH.
+
+LEY: {pack[0][1]['law']}
+
+{fragments}
+
+Responde SOLO con el array JSON válido."""
+
+
+# Changes whenever the instructions change, so telemetry of prompt versions can be compared
+_TEMPLATE_CHUNK = {"law": "", "section": "", "text": ""}
+PROMPT_VERSION = prompt_key(DEPLOYMENT, SYSTEM_PROMPT,
+                            build_prompt(_TEMPLATE_CHUNK) + build_pack_prompt([(0, _TEMPLATE_CHUNK)]))[:8]
+telemetry = Telemetry({"model": DEPLOYMENT, "prompt": PROMPT_VERSION})
+
+
+def build_messages(chunk):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_prompt(chunk)}
+    ]
+
+
+def build_pack_messages(pack):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_pack_prompt(pack)}
+    ]
+
+
+def chunk_key(chunk, model=DEPLOYMENT):
+    return prompt_key(model, SYSTEM_PROMPT, build_prompt(chunk))
+
+
+def pack_key(chunk):
+    """Key of a packed answer: the chunk in the pack prompt, so it changes with the pack
+    instructions but not with the chunks it happened to share a request with."""
+    return prompt_key(DEPLOYMENT, SYSTEM_PROMPT, build_pack_prompt([(0, chunk)]))
+
+
+def chunk_keys(chunk):
+    """Keys a stored result for chunk may have, in lookup order: answered live or by the
+    batch deployment, then in a packed request (already checked entry by entry)."""
+    return [chunk_key(chunk, model) for model in dict.fromkeys([DEPLOYMENT, BATCH_DEPLOYMENT])] + [pack_key(chunk)]
+
+
+def expected_output():
+    if not recent_outputs:
+        return EXPECTED_OUTPUT
+    return sum(recent_outputs) // len(recent_outputs)
+
+
+def strip_fences(content):
     clean = content.strip()
     if clean.startswith('```'):
         clean = clean.split('\n', 1)[1] if '\n' in clean else clean[3:]
         if '```' in clean:
             clean = clean.rsplit('```', 1)[0]
+    return clean
+
+
+def parse_response(content):
+    if not content:
+        return None
+    clean = strip_fences(content)
     try:
         return json.loads(clean)
     except json.JSONDecodeError:
@@ -61,114 +204,490 @@ def parse_response(content):
     return None
 
 
-async def enrich_one(client, chunk, idx, semaphore):
+def parse_pack_response(content):
+    """{chunk id (str): result} from a packed answer, a JSON array of objects with "id"."""
+    if not content:
+        return {}
+    clean = strip_fences(content)
+    try:
+        data = json.loads(clean)
+    except json.JSONDecodeError:
+        match = re.search(r'\[.*\]', clean, re.DOTALL)
+        if not match:
+            return {}
+        try:
+            data = json.loads(match.group())
+        except json.JSONDecodeError:
+            return {}
+    if isinstance(data, dict):
+        # Wrapped in an object ({"fragmentos": [...]}) despite the instructions
+        data = next((v for v in data.values() if isinstance(v, list)), [])
+    entries = {}
+    for entry in data if isinstance(data, list) else []:
+        if isinstance(entry, dict) and 'id' in entry:
+            entries[str(entry['id']).strip()] = {k: v for k, v in entry.items() if k != 'id'}
+    return entries
+
+
+def pack_chunks(todo):
+    """Group todo into requests: short chunks of one law packed together, the rest alone."""
+    groups = []
+    open_packs = {}  # law -> [pack, text tokens]
+    for idx, chunk in todo:
+        tokens = count_tokens(chunk['text'][:MAX_TEXT_CHARS])
+        if tokens > SMALL_CHUNK_TOKENS:
+            groups.append([(idx, chunk)])
+            continue
+        current = open_packs.get(chunk['law'])
+        if current is None or current[1] + tokens > PACK_TOKENS or len(current[0]) >= PACK_MAX:
+            current = open_packs[chunk['law']] = [[], 0]
+            groups.append(current[0])
+        current[0].append((idx, chunk))
+        current[1] += tokens
+    return groups
+
+
+def record(kind, outcome, start, sent=None, usage=None, first_token=None):
+    """One API call in the telemetry: outcome, time queued and in flight, token usage."""
+    end = time.monotonic()
+    telemetry.count("requests", kind=kind, outcome=outcome)
+    if sent is None:
+        return
+    telemetry.observe("queue_wait_seconds", sent - start, kind=kind)
+    telemetry.observe("latency_seconds", end - sent, kind=kind, outcome=outcome)
+    if first_token is not None:
+        telemetry.observe("first_token_seconds", first_token - sent, kind=kind)
+    if usage:
+        telemetry.observe("prompt_tokens", usage.prompt_tokens, kind=kind)
+        telemetry.observe("completion_tokens", usage.completion_tokens, kind=kind)
+        details = getattr(usage, "completion_tokens_details", None)
+        telemetry.observe("reasoning_tokens", getattr(details, "reasoning_tokens", None), kind=kind)
+
+
+def record_throttle(kind, wait):
+    telemetry.count("throttles", kind=kind)
+    telemetry.observe("throttle_wait_seconds", wait, kind=kind)
+
+
+async def send(client, messages, limiter, bucket, label, max_tokens=4096, chunks=1):
+    """One request through the limiter and the token bucket; returns the message content.
+
+    A 429 gives the reservation back, pauses the limiter and is raised again.
+    """
+    kind = "pack" if chunks > 1 else "chunk"
+    reserved = chat_tokens(messages) + expected_output() * chunks
+    start = time.monotonic()
+    sent = None
+    try:
+        async with limiter:
+            await bucket.acquire(reserved)
+            sent = time.monotonic()
+            raw = await client.chat.completions.with_raw_response.create(
+                messages=messages,
+                max_completion_tokens=max_tokens,
+                model=DEPLOYMENT,
+            )
+    except RateLimitError as e:
+        # The limiter holds every request for the retry-after the endpoint asked for
+        bucket.refund(reserved)
+        wait = limiter.throttled(e.response.headers)
+        record(kind, "throttled", start, sent)
+        record_throttle(kind, wait)
+        print(f"  [{label}] Rate limited, waiting {wait:.0f}s (concurrency -> {int(limiter.limit)})")
+        raise
+    except Exception:
+        record(kind, "error", start, sent)
+        raise
+    limiter.success(raw.headers)
+    resp = await raw.parse()
+    record(kind, "ok", start, sent, resp.usage)
+    if resp.usage:
+        bucket.settle(reserved, resp.usage.total_tokens)
+        recent_outputs.append(resp.usage.completion_tokens // chunks)
+    return resp.choices[0].message.content
+
+
+async def send_stream(client, messages, limiter, bucket, label):
+    """Like send(), streamed and checked on the fly; returns the parsed result or None.
+
+    The stream is closed as soon as the answer cannot be a valid enrichment.
+    That request keeps its whole reservation, since its real usage never arrives.
+    """
+    reserved = chat_tokens(messages) + expected_output()
+    watch = JsonStream(ENRICHMENT_SCHEMA)
+    usage = None
+    start = time.monotonic()
+    sent = first_token = None
+    try:
+        async with limiter:
+            await bucket.acquire(reserved)
+            sent = time.monotonic()
+            raw = await client.chat.completions.with_raw_response.create(
+                messages=messages,
+                max_completion_tokens=4096,
+                model=DEPLOYMENT,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            stream = await raw.parse()
+            async for event in stream:
+                if event.usage:
+                    usage = event.usage
+                if event.choices and event.choices[0].delta.content:
+                    if first_token is None:
+                        first_token = time.monotonic()
+                    if watch.feed(event.choices[0].delta.content) == "invalid":
+                        await stream.close()
+                        break
+    except RateLimitError as e:
+        bucket.refund(reserved)
+        wait = limiter.throttled(e.response.headers)
+        record("stream", "throttled", start, sent)
+        record_throttle("stream", wait)
+        print(f"  [{label}] Rate limited, waiting {wait:.0f}s (concurrency -> {int(limiter.limit)})")
+        raise
+    except Exception:
+        record("stream", "error", start, sent, first_token=first_token)
+        raise
+    limiter.success(raw.headers)
+    record("stream", "cancelled" if watch.status == "invalid" else "ok", start, sent, usage, first_token)
+    if usage:
+        bucket.settle(reserved, usage.total_tokens)
+        recent_outputs.append(usage.completion_tokens)
+    if watch.status == "invalid":
+        stream_stats["cancelled"] += 1
+        print(f"  [{label}] Stopped an invalid answer after {len(watch.text)} chars")
+        return None
+    result = watch.result()
+    if watch.repaired:
+        stream_stats["repaired"] += 1
+        telemetry.count("repaired", kind="stream")
+    return result
+
+
+async def enrich_one(client, chunk, idx, limiter, bucket, stream=False):
     """Enrich a single chunk with retry logic."""
     # Skip very short chunks
     if len(chunk['text']) < 60:
-        return idx, {"resumen": "Artículo derogado.", "palabras_clave": [], "preguntas": []}
-
-    async with semaphore:
-        for attempt in range(MAX_RETRIES):
-            try:
-                resp = await client.chat.completions.create(
-                    messages=[
-                        {"role": "system", "content": SYSTEM_PROMPT},
-                        {"role": "user", "content": build_prompt(chunk)}
-                    ],
-                    max_completion_tokens=4096,
-                    model=DEPLOYMENT,
-                )
-                parsed = parse_response(resp.choices[0].message.content)
-                if parsed and 'resumen' in parsed:
-                    return idx, parsed
-                else:
-                    await asyncio.sleep(2)
-            except Exception as e:
-                msg = str(e)
-                if '429' in msg:
-                    wait = 15 * (attempt + 1)
-                    print(f"  [{idx}] Rate limited, waiting {wait}s")
-                    await asyncio.sleep(wait)
-                else:
-                    print(f"  [{idx}] Error: {msg[:80]}")
-                    await asyncio.sleep(5)
+        return idx, DEROGATED
+
+    messages = build_messages(chunk)
+
+    kind = "stream" if stream else "chunk"
+    attempt = throttled = 0
+    while attempt < MAX_RETRIES and throttled < MAX_THROTTLE_RETRIES:
+        if attempt or throttled:
+            telemetry.count("retries", kind=kind)
+        try:
+            if stream:
+                parsed = await send_stream(client, messages, limiter, bucket, idx)
+            else:
+                parsed = parse_response(await send(client, messages, limiter, bucket, idx))
+            if parsed and 'resumen' in parsed:
+                return idx, parsed
+            telemetry.count("parse_failures", kind=kind)
+            attempt += 1
+            await asyncio.sleep(2)
+        except RateLimitError:
+            throttled += 1
+        except Exception as e:
+            attempt += 1
+            print(f"  [{idx}] Error: {str(e)[:80]}")
+            await asyncio.sleep(5)
 
     return idx, {"resumen": "", "palabras_clave": [], "preguntas": []}
 
 
-async def main():
-    chunks = json.load(open(IN_PATH, encoding="utf-8"))
-    total = len(chunks)
-    print(f"Loaded {total} chunks")
-
-    # Load progress
-    enriched = {}
-    if os.path.exists(PROGRESS_PATH):
-        enriched = json.load(open(PROGRESS_PATH, encoding="utf-8"))
-        print(f"Resuming: {len(enriched)} already done")
-
-    # Find chunks to process
-    todo = [(i, c) for i, c in enumerate(chunks) if str(i) not in enriched]
-    print(f"Remaining: {len(todo)} chunks")
-
-    if not todo:
-        print("Nothing to do!")
+async def enrich_pack(client, pack, limiter, bucket, stats, stream=False):
+    """Enrich a group of chunks in one request; [(idx, result, packed)] for each of them.
+
+    Chunks the packed answer misses or gets wrong go through enrich_one (packed False).
+    """
+    if len(pack) == 1:
+        idx, chunk = pack[0]
+        return [(*await enrich_one(client, chunk, idx, limiter, bucket, stream), False)]
+
+    label = f"{pack[0][0]}+{len(pack) - 1}"
+    content = None
+    throttled = 0
+    while throttled < MAX_THROTTLE_RETRIES:
+        try:
+            content = await send(client, build_pack_messages(pack), limiter, bucket, label,
+                                 max_tokens=PACK_COMPLETION_TOKENS, chunks=len(pack))
+            break
+        except RateLimitError:
+            throttled += 1
+        except Exception as e:
+            print(f"  [{label}] Pack error: {str(e)[:80]}")
+            break
+
+    entries = parse_pack_response(content)
+    if content is not None and not entries:
+        telemetry.count("parse_failures", kind="pack")
+    results = []
+    fallback = []
+    for idx, chunk in pack:
+        result = entries.get(str(idx))
+        if result and 'resumen' in result:
+            results.append((idx, result, True))
+        else:
+            fallback.append((idx, chunk))
+    stats["packs"] += 1
+    stats["packed"] += len(pack) - len(fallback)
+    stats["fallback"] += len(fallback)
+    telemetry.count("pack_fallbacks", len(fallback))
+    if fallback:
+        alone = await asyncio.gather(*(enrich_one(client, c, i, limiter, bucket, stream) for i, c in fallback))
+        results.extend((idx, result, False) for idx, result in alone)
+    return results
+
+
+def import_progress(cache):
+    """Move the results of the old enrichment_progress.json into the cache, once.
+
+    That file was keyed by position in IN_PATH, so it is only valid for the chunk file
+    it was written with: run this before recutting. A chunk file newer than the
+    progress, or with fewer chunks than it has indices, is refused, since the results
+    would be stored for good under other chunks' keys. It is renamed to *.imported after.
+    """
+    if not os.path.exists(PROGRESS_PATH):
+        print(f"Nothing to import: {PROGRESS_PATH} not found")
+        return
+    if os.path.getmtime(IN_PATH) > os.path.getmtime(PROGRESS_PATH):
+        print(f"Not importing: {IN_PATH} changed after {PROGRESS_PATH} was written")
         return
+    with open(PROGRESS_PATH, encoding="utf-8") as f:
+        enriched = json.load(f)
+    chunks = list(iter_chunks(IN_PATH))
+    last = max((int(i) for i in enriched), default=-1)
+    if last >= len(chunks):
+        print(f"Not importing: {PROGRESS_PATH} has index {last}, {IN_PATH} only {len(chunks)} chunks")
+        return
+    rows = []
+    for i, chunk in enumerate(chunks):
+        result = enriched.get(str(i))
+        if result and result.get('resumen') and len(chunk['text']) >= 60:
+            rows.append((chunk_key(chunk), result))
+    cache.put_many(DEPLOYMENT, rows)
+    os.replace(PROGRESS_PATH, PROGRESS_PATH + ".imported")
+    print(f"Imported {len(rows)} results from {PROGRESS_PATH}")
 
+
+def enrichment_for(chunk, cache):
+    """The stored result for a chunk ({} if it has none yet)."""
+    if len(chunk['text']) < 60:
+        return DEROGATED
+    for key in chunk_keys(chunk):
+        result = cache.get(key)
+        if result is not None:
+            return result
+    return {}
+
+
+def merged_chunks(cache):
+    """Input chunks with their enrichment, streamed from the input file and the cache."""
+    for chunk in iter_chunks(IN_PATH):
+        result = enrichment_for(chunk, cache)
+        chunk['resumen'] = result.get('resumen', '')
+        chunk['palabras_clave'] = result.get('palabras_clave', [])
+        chunk['preguntas'] = result.get('preguntas', [])
+        yield chunk
+
+
+def pending_chunks(cache):
+    """(total chunks, [(index, chunk)] with no stored result)."""
+    # Replay the log: every prompt answered before, at any position, needs no request
+    total = 0
+    todo = []
+    for i, c in enumerate(iter_chunks(IN_PATH)):
+        total += 1
+        if len(c['text']) >= 60 and not any(key in cache for key in chunk_keys(c)):
+            todo.append((i, c))
+    return total, todo
+
+
+async def enrich_live(todo, cache, pack=False, stream=False):
+    """Send todo as live requests (short chunks packed if pack, single ones streamed if
+    stream). Returns (ok, failed)."""
     client = AsyncAzureOpenAI(
         api_version=API_VERSION,
         azure_endpoint=ENDPOINT,
         api_key=API_KEY,
+        max_retries=0,  # 429s go to the limiter, not to the SDK's own backoff
     )
 
-    semaphore = asyncio.Semaphore(CONCURRENCY)
+    limiter = AimdLimiter(initial=CONCURRENCY, maximum=MAX_CONCURRENCY)
+    bucket = TokenBucket(TPM)
     start_time = time.time()
-    processed = 0
-    errors = 0
-
-    # Process in batches of SAVE_EVERY
-    for batch_start in range(0, len(todo), SAVE_EVERY):
-        batch = todo[batch_start:batch_start + SAVE_EVERY]
-
-        tasks = [enrich_one(client, c, i, semaphore) for i, c in batch]
-        results = await asyncio.gather(*tasks)
-
-        for idx, result in results:
-            enriched[str(idx)] = result
-            if result.get('resumen'):
-                processed += 1
-            else:
-                errors += 1
+    groups = pack_chunks(todo) if pack else [[item] for item in todo]
+    stats = {"packs": 0, "packed": 0, "fallback": 0}
+    if pack:
+        print(f"Packed into {len(groups)} requests ({sum(len(g) > 1 for g in groups)} multi-chunk)")
+
+    queue = asyncio.Queue()
+    for g in groups:
+        queue.put_nowait(g)
+    finished = asyncio.Queue()  # (chunk, result, packed) from the workers to the checkpoint task
+    counts = [0, 0]  # ok, failed
+
+    async def worker():
+        while True:
+            try:
+                group = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            chunks = dict(group)
+            for idx, result, packed in await enrich_pack(client, group, limiter, bucket, stats, stream):
+                finished.put_nowait((chunks[idx], result, packed))
+
+    async def checkpoint():
+        """Store results in groups, on count or time, without blocking the workers."""
+        rows = []
+        last = time.monotonic()
+        reported = 0
+        while True:
+            try:
+                item = await asyncio.wait_for(finished.get(), CHECKPOINT_SECONDS)
+            except asyncio.TimeoutError:
+                item = None
+            if item is not None and item[0] is not None:
+                chunk, result, packed = item
+                if result.get('resumen'):
+                    counts[0] += 1
+                    rows.append((pack_key(chunk) if packed else chunk_key(chunk), result))
+                else:
+                    counts[1] += 1
+            closing = item is not None and item[0] is None
+            if rows and (len(rows) >= SAVE_EVERY or time.monotonic() - last >= CHECKPOINT_SECONDS or closing):
+                await asyncio.to_thread(cache.put_many, DEPLOYMENT, rows)
+                rows = []
+                last = time.monotonic()
+
+            done = counts[0] + counts[1]
+            if done - reported >= SAVE_EVERY or (closing and done > reported):
+                reported = done
+                elapsed = time.time() - start_time
+                rate = done / elapsed * 60 if elapsed > 0 else 0
+                eta = (len(todo) - done) / rate if rate > 0 else 0
+                print(f"[{done}/{len(todo)}] {counts[0]} ok, {counts[1]} err | "
+                      f"{rate:.1f}/min | ETA: {eta:.0f}min | concurrency {int(limiter.limit)}, "
+                      f"{limiter.throttles} throttled | tokens used/reserved {bucket.accuracy():.2f}")
+                telemetry.save(TELEMETRY_PATH, PROM_PATH)
+            if closing:
+                return
+
+    writer = asyncio.create_task(checkpoint())
+    workers = [asyncio.create_task(worker()) for _ in range(min(WORKERS, len(groups)))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        # One worker failing (or Ctrl+C) stops the rest, and what they finished is still stored
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        finished.put_nowait((None, None, False))
+        await writer
+
+    if stats["packs"]:
+        print(f"Packs: {stats['packs']} requests answered {stats['packed']} chunks, "
+              f"{stats['fallback']} sent again alone")
+    if stream:
+        print(f"Streaming: {stream_stats['cancelled']} answers stopped early, "
+              f"{stream_stats['repaired']} truncated answers repaired")
+    print(f"\nTelemetry ({TELEMETRY_PATH}):")
+    print_report(telemetry.report())
+    await client.close()
+    return tuple(counts)
+
+
+def dry_run_answer(body):
+    """Offline stand-in for the batch endpoint: the same placeholder answer to every request."""
+    content = json.dumps({"resumen": "(dry run)", "palabras_clave": [], "preguntas": []})
+    return {
+        "model": body["model"],
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+    }
+
+
+def batch_backend(kind):
+    """(backend, work dir, store results?) for --batch azure|local."""
+    if kind == "azure":
+        client = AzureOpenAI(api_version=API_VERSION, azure_endpoint=ENDPOINT, api_key=API_KEY)
+        return AzureBatch(client), BATCH_DIR, True
+    # Dry run: the same JSONL and job bookkeeping, no API calls, nothing cached.
+    # Its own work dir, so its job ids never reach an Azure run.
+    return LocalBatch(dry_run_answer), os.path.join(BATCH_DIR, "dry_run"), False
+
+
+def ingest_batch(bodies, cache, stats, store=True):
+    """Store the valid results of a batch output; the rest stay pending for the next run."""
+    for key, body in bodies.items():
+        parsed = parse_response(message_content(body))
+        if parsed and 'resumen' in parsed:
+            if store:
+                cache.put(key, BATCH_DEPLOYMENT, parsed)
+            stats[0] += 1
+        else:
+            stats[1] += 1
+    cache.flush()
+
+
+def enrich_batch(todo, cache, backend, work_dir, store=True):
+    """Send todo as one offline batch job (custom_id = prompt key). Returns (ok, failed)."""
+    stats = [0, 0]
+    requests = {}
+    for _, c in todo:
+        key = chunk_key(c, BATCH_DEPLOYMENT)  # identical prompts (repeated text) are asked once
+        requests[key] = chat_request(key, BATCH_DEPLOYMENT, build_messages(c), max_completion_tokens=4096)
+    if requests:
+        run_batch(backend, list(requests.values()), work_dir,
+                  on_results=lambda bodies: ingest_batch(bodies, cache, stats, store))
+    return tuple(stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrich chunks with summaries, keywords and questions")
+    parser.add_argument("--batch", choices=["azure", "local"],
+                        help="Send pending chunks as a batch job instead of live requests "
+                             "(local: offline dry run, nothing stored)")
+    parser.add_argument("--pack", action="store_true",
+                        help="Pack short chunks of the same law into shared requests (live mode)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream single-chunk answers, stopping invalid ones early (live mode)")
+    parser.add_argument("--import-progress", action="store_true",
+                        help="Import the old index-keyed enrichment_progress.json (only valid for "
+                             "the chunk file it was written with)")
+    args = parser.parse_args()
+
+    cache = EnrichCache()
+    if args.import_progress:
+        import_progress(cache)
+    start_time = time.time()
+    backend, work_dir, store = batch_backend(args.batch) if args.batch else (None, None, True)
+    if backend:
+        # A batch submitted by a run that stopped before ingesting it
+        stats = [0, 0]
+        resume_jobs(backend, work_dir, on_results=lambda bodies: ingest_batch(bodies, cache, stats, store))
 
-        # Save progress
-        with open(PROGRESS_PATH, "w", encoding="utf-8") as f:
-            json.dump(enriched, f, ensure_ascii=False)
+    total, todo = pending_chunks(cache)
+    print(f"Loaded {total} chunks")
+    print(f"Already enriched: {total - len(todo)} chunks")
+    print(f"Remaining: {len(todo)} chunks")
 
-        done = len(enriched)
-        elapsed = time.time() - start_time
-        rate = (processed + errors) / elapsed * 60 if elapsed > 0 else 0
-        remaining_chunks = total - done
-        eta = remaining_chunks / rate if rate > 0 else 0
-        print(f"[{done}/{total}] {processed} ok, {errors} err | "
-              f"{rate:.1f}/min | ETA: {eta:.0f}min")
+    if backend:
+        processed, errors = enrich_batch(todo, cache, backend, work_dir, store)
+    else:
+        processed, errors = asyncio.run(enrich_live(todo, cache, pack=args.pack, stream=args.stream))
 
-    await client.close()
+    if not store:
+        cache.close()
+        print(f"\nDry run: {processed} placeholder answers parsed, {errors} errors; nothing stored")
+        return
 
-    # Merge enrichments into chunks
+    # Merge enrichments into chunks, one chunk in memory at a time
     print(f"\nMerging...")
-    for i, chunk in enumerate(chunks):
-        key = str(i)
-        if key in enriched:
-            chunk['resumen'] = enriched[key].get('resumen', '')
-            chunk['palabras_clave'] = enriched[key].get('palabras_clave', [])
-            chunk['preguntas'] = enriched[key].get('preguntas', [])
-        else:
-            chunk['resumen'] = ''
-            chunk['palabras_clave'] = []
-            chunk['preguntas'] = []
-
-    with open(OUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(chunks, f, ensure_ascii=False, indent=2)
+    write_json_array(OUT_PATH, merged_chunks(cache))
+    cache.close()
 
     elapsed_total = time.time() - start_time
     print(f"\nDone! {processed} enriched, {errors} errors")
@@ -177,4 +696,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -1,159 +1,520 @@
-import fitz, json, re, os
+"""
+Extract article-level chunks from the BOE Código Laboral y de la Seguridad Social PDF.
+
+Usage:
+    python extract_chunks.py                # serial extraction
+    python extract_chunks.py --workers 8    # split the TOC law list across 8 processes
+    python extract_chunks.py --jsonl        # stream normativa_chunks.jsonl while extracting
+                                            # (python chunk_io.py converts it back to .json)
+    python extract_chunks.py --incremental  # only re-extract laws whose pages changed since
+                                            # the last run (normativa_manifest.json, written
+                                            # by every run)
+    python extract_chunks.py --layout       # drop running headers/footers by page geometry
+
+Page text and TOC are read through the persistent cache in pdf_cache.py (--no-cache to bypass).
+"""
+import json, re, os, argparse, hashlib
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from multiprocessing import Pool
+
+from chunk_io import JsonlWriter, iter_chunks
+from pdf_cache import CACHE_PATH, CachedPdf, open_pdf
+from pdf_layout import is_word_char, page_separators
+from toc_tree import TREE_NAME, TocTree
 
 PDF_PATH = "/home/javier/rag-ss/pdfs/normativa/CODIGO_Laboral_y_SS_BOE.pdf"
 OUT_DIR = "/home/javier/rag-ss/chunks"
-os.makedirs(OUT_DIR, exist_ok=True)
-
-doc = fitz.open(PDF_PATH)
-toc = doc.get_toc()
-num_pages = len(doc)
 
 SECTION_SIGN = "\u00A7"  # §
 
-# Step 1: Identify each law/norm (L1 entries starting with §)
-laws = []
-for i, entry in enumerate(toc):
-    level, title, page = entry
-    if level == 1 and title.strip().startswith(SECTION_SIGN):
-        laws.append({"idx": i, "title": title.strip(), "start_page": page})
-
-# Set end page for each law
-for i in range(len(laws) - 1):
-    laws[i]["end_page"] = laws[i + 1]["start_page"]
-laws[-1]["end_page"] = num_pages + 1
-
-print(f"Found {len(laws)} laws/norms")
-for l in laws[:10]:
-    print(f"  {l['title'][:80]}  (pp. {l['start_page']}-{l['end_page']-1})")
-print("  ...")
-for l in laws[-5:]:
-    print(f"  {l['title'][:80]}  (pp. {l['start_page']}-{l['end_page']-1})")
-
-# Step 2: For each law, extract text and split by article pattern
-chunks = []
-skip_sections = ["Sumario", "ndice Sistem"]
-
-for law in laws:
+# Index/summary pages, not real norms
+SKIP_SECTIONS = ["Sumario", "ndice Sistem"]
+
+# Article / Disposición headings, matched at the start of a line.
+# Only the first letter is case-sensitive: a lowercase "artículo 45.1" at the start of
+# a line is a cross-reference, not a heading (the old IGNORECASE split that
+# recut_chunks.js repairs), while "ARTÍCULO 5.", "Artículo 5A." and "12 Bis." are headings.
+HEADING = re.compile(
+    r'A(?i:rt[ií]culo\s+\d+[a-z]?(?:\s+(?:bis|ter|qu[aá]ter|quinquies|sexies|septies|octies))?\.)'
+    r'|'
+    r'D(?i:isposici[oó]n\s+(?:adicional|transitoria|derogatoria|final))(?=\s|$)'
+)
+
+MIN_CHUNK_CHARS = 50      # shorter chunks are bare headers
+MAX_CHUNK_CHARS = 6000    # longer articles are split at paragraph boundaries...
+PART_CHARS = 5500         # ...into parts of about this size
+MAX_SINGLE_CHARS = 8000   # cap for preambles and "Texto completo" chunks
+
+
+MANIFEST_NAME = "normativa_manifest.json"
+MANIFEST_VERSION = 4  # bump when the splitting rules or chunk fields change: forces a full rebuild
+
+# Running headers and page numbers change with repagination, not with content,
+# so they are left out of the page hashes
+RUNNING_LINE = re.compile(
+    r'^(?:C[OÓ]DIGO LABORAL Y DE LA SEGURIDAD SOCIAL|§\s*\d+\b[^\n]*|–\s*\d+\s*–)[ \t]*$',
+    re.MULTILINE
+)
+
+
+def find_laws(toc, num_pages):
+    """Identify each law/norm (L1 TOC entries starting with §) and its page range."""
+    laws = []
+    for i, entry in enumerate(toc):
+        level, title, page = entry
+        if level == 1 and title.strip().startswith(SECTION_SIGN):
+            laws.append({"idx": i, "title": title.strip(), "start_page": page})
+
+    # Set end page for each law
+    for i in range(len(laws) - 1):
+        laws[i]["end_page"] = laws[i + 1]["start_page"]
+    laws[-1]["end_page"] = num_pages + 1
+    return laws
+
+
+def law_key(title):
+    """Manifest key for a law: its title without the "§ N." prefix, which shifts when laws are added."""
+    return re.sub(r'^§\s*\d+\.\s*', '', title).strip()
+
+
+def page_range(doc, law):
+    """0-indexed [start, end) page range of a law."""
+    start_p = law["start_page"] - 1
+    end_p = min(law["end_page"] - 1, len(doc))
+    return start_p, end_p
+
+
+def hash_law(doc, law):
+    """Content hashes of a law's pages and of the law as a whole."""
+    start_p, end_p = page_range(doc, law)
+    page_hashes = []
+    for page_text in doc.page_texts(start_p, end_p):
+        text = RUNNING_LINE.sub('', page_text)
+        page_hashes.append(hashlib.sha256(text.encode("utf-8")).hexdigest())
+    return {
+        "title": law["title"],
+        "hash": hashlib.sha256("".join(page_hashes).encode("ascii")).hexdigest(),
+        "pages": [law["start_page"], law["end_page"] - 1],
+        "page_hashes": page_hashes,
+    }
+
+
+def extract_law(doc, law):
+    """Extract the text of one law and split it into article chunks."""
+    chunks = []
     law_title = law["title"]
     # Skip index/summary pages
-    if any(s in law_title for s in skip_sections):
-        continue
+    if any(s in law_title for s in SKIP_SECTIONS):
+        return chunks
 
     # Extract text page by page for this law
-    start_p = law["start_page"] - 1  # 0-indexed
-    end_p = min(law["end_page"] - 1, num_pages)  # exclusive, 0-indexed
+    start_p, end_p = page_range(doc, law)
+
+    # Join once: repeated += is quadratic on long laws like the LGSS
+    texts = doc.page_texts(start_p, end_p)
+    seps = page_separators(texts) if doc.kind == "layout" else ["\n"] * len(texts)
+    full_text = "".join(t + sep for t, sep in zip(texts, seps))
+
+    # Line where each page starts, so every chunk can carry the page of its heading
+    page_starts, line = [], 0
+    for t, sep in zip(texts, seps):
+        page_starts.append(line)
+        line += t.count("\n") + len(sep)
+    return split_law(full_text, law, page_starts)
 
-    full_text = ""
-    for p in range(start_p, end_p):
-        full_text += doc[p].get_text() + "\n"
 
-    # Split by article patterns
-    # Artículo N. or Disposición adicional/transitoria/derogatoria/final
-    art_pattern = re.compile(
-        r'\n(Art[ií]culo\s+\d+[a-z]?(?:\s+bis|\s+ter|\s+qu[aá]ter|\s+quinquies|\s+sexies|\s+septies|\s+octies)?\.\s*[^\n]*)\n'
-        r'|'
-        r'\n(Disposici[oó]n\s+(?:adicional|transitoria|derogatoria|final)\s+[^\n]*)\n',
-        re.IGNORECASE
-    )
+def _article_chunks(law_title, art_title, paras):
+    """Build the chunk(s) of one article from its paragraphs (lists of lines)."""
+    # Trailing whitespace is not part of the article
+    while paras:
+        last = paras[-1]
+        while last and not last[-1].strip():
+            last.pop()
+        if last:
+            last[-1] = last[-1].rstrip()
+            break
+        paras.pop()
 
-    splits = list(art_pattern.finditer(full_text))
+    texts = ["\n".join(p) for p in paras]
+    total = sum(len(t) for t in texts) + 2 * (len(texts) - 1)
 
-    if not splits:
+    # Skip very short chunks (headers only)
+    if total < MIN_CHUNK_CHARS:
+        return []
+
+    if total <= MAX_CHUNK_CHARS:
+        return [{"law": law_title, "section": art_title, "text": "\n\n".join(texts)}]
+
+    # Sub-chunk at paragraph boundaries
+    chunks = []
+    current, current_len, part_num = [], 0, 1
+    for t in texts:
+        if current_len + len(t) > PART_CHARS and current:
+            chunks.append({
+                "law": law_title,
+                "section": f"{art_title} (parte {part_num})",
+                "text": "\n\n".join(current).strip(),
+            })
+            part_num += 1
+            current, current_len = [], 0
+        current.append(t)
+        current_len += len(t) + 2
+    last_text = "\n\n".join(current).strip()
+    if last_text:
+        suffix = f" (parte {part_num})" if part_num > 1 else ""
+        chunks.append({"law": law_title, "section": art_title + suffix, "text": last_text})
+    return chunks
+
+
+def split_law(full_text, law, page_starts=None):
+    """Split the text of one law into article chunks in a single scan over its lines.
+
+    Finds headings, joins hyphenated line breaks ("word-\nrest" -> "wordrest"),
+    collapses runs of blank lines and applies the 6000/5500 sub-chunk rule as it goes.
+    With page_starts (first line of each page) every chunk gets the "page" of its
+    heading, which toc_tree.py maps to a chapter.
+    """
+    law_title = law["title"]
+    lines = full_text.split("\n")
+    n = len(lines)
+    chunks = []
+
+    def add_article(heading_line, paras):
+        new = _article_chunks(law_title, art_title, paras)
+        if page_starts:
+            page = law["start_page"] + bisect_right(page_starts, heading_line) - 1
+            for c in new:
+                c["page"] = page
+        chunks.extend(new)
+
+    first_heading = None
+    art_title = None
+    art_line = 0
+    paras, para = [], []
+    join_left = False   # last line may still lend its char before "-" to a join
+    blocked_until = 0   # a heading must follow a line break that no earlier heading consumed
+
+    for i, line in enumerate(lines):
+        m = None
+        if i > blocked_until and line[:1] in "AD":
+            m = HEADING.match(line)
+            if m and m.end() == len(line) and line[0] == "D" and i + 1 >= n - 1:
+                m = None  # "Disposición final" needs more text after its line break
+
+        if m:
+            if art_title is None:
+                first_heading = i
+            else:
+                if para:
+                    paras.append(para)
+                add_article(art_line, paras)
+            art_line = i
+
+            end = i
+            if not line[m.end():].strip():
+                # Bare "Artículo N." line: the title runs on to the next non-blank line
+                end = i + 1
+                while end < n - 1 and not lines[end].strip():
+                    end += 1
+                end = min(end, n - 1)
+            art_title = "\n".join(lines[i:end + 1]).strip()
+            blocked_until = end + 1
+            paras, para, join_left = [], [line], True
+            continue
+
+        if art_title is None:
+            continue  # preamble, taken verbatim below
+
+        if not line:
+            # Blank line: paragraph break (runs of blank lines collapse into one)
+            if para:
+                paras.append(para)
+                para = []
+            continue
+
+        if para and join_left and is_word_char(line[0]):
+            prev = para[-1]
+            if len(prev) > 1 and prev[-1] == "-" and is_word_char(prev[-2]):
+                para[-1] = prev[:-1] + line
+                # A two-char "x-" line already gave its "x" to this join
+                join_left = len(line) != 2
+                continue
+        para.append(line)
+        join_left = True
+
+    if art_title is None:
         # No articles found, store as single chunk
-        if len(full_text.strip()) > 100:
+        text = full_text.strip()
+        if len(text) > 100:
             chunks.append({
                 "law": law_title,
                 "section": "Texto completo",
-                "text": full_text.strip()[:8000],
+                "text": text[:MAX_SINGLE_CHARS],
                 "pages": f"{law['start_page']}-{law['end_page']-1}"
             })
-        continue
+            if page_starts:
+                chunks[-1]["page"] = law["start_page"]
+        return chunks
+
+    if para:
+        paras.append(para)
+    add_article(art_line, paras)
 
     # Also capture preamble text before first article
-    preamble = full_text[:splits[0].start()].strip()
+    preamble = "\n".join(lines[:first_heading]).strip()
     if len(preamble) > 200:
-        chunks.append({
+        chunks.insert(0, {
             "law": law_title,
             "section": "Preambulo / Exposicion de motivos",
-            "text": preamble[:8000],
+            "text": preamble[:MAX_SINGLE_CHARS],
         })
+        if page_starts:
+            chunks[0]["page"] = law["start_page"]
+    return chunks
 
-    # Create chunks between article matches
-    for j, match in enumerate(splits):
-        art_title = (match.group(1) or match.group(2)).strip()
-        start_pos = match.start()
-        end_pos = splits[j + 1].start() if j + 1 < len(splits) else len(full_text)
 
-        text = full_text[start_pos:end_pos].strip()
+# ── Process pool: each worker keeps its own document / cache handle ──
+_worker_doc = None
 
-        # Clean up common PDF artifacts
-        # Fix hyphenated line breaks: "word-\nrest" -> "wordrest"
-        text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)
-        # Collapse multiple blank lines
-        text = re.sub(r'\n{3,}', '\n\n', text)
 
-        # Skip very short chunks (headers only)
-        if len(text) < 50:
-            continue
+def _init_worker(spec):
+    global _worker_doc
+    _worker_doc = CachedPdf(*spec)
 
-        # Sub-chunk if excessively long (>6000 chars)
-        if len(text) > 6000:
-            # Try to split at paragraph boundaries
-            paragraphs = text.split('\n\n')
-            current_chunk = ""
-            part_num = 1
-            for para in paragraphs:
-                if len(current_chunk) + len(para) > 5500 and current_chunk:
-                    chunks.append({
-                        "law": law_title,
-                        "section": f"{art_title} (parte {part_num})",
-                        "text": current_chunk.strip(),
-                    })
-                    part_num += 1
-                    current_chunk = para + "\n\n"
-                else:
-                    current_chunk += para + "\n\n"
-            if current_chunk.strip():
-                suffix = f" (parte {part_num})" if part_num > 1 else ""
-                chunks.append({
-                    "law": law_title,
-                    "section": art_title + suffix,
-                    "text": current_chunk.strip(),
-                })
+
+def _extract_law_worker(law):
+    return extract_law(_worker_doc, law)
+
+
+def _hash_law_worker(law):
+    return hash_law(_worker_doc, law)
+
+
+def hash_laws(doc, laws, workers=1):
+    """Manifest entries for every law, in TOC order."""
+    if workers <= 1:
+        return [hash_law(doc, law) for law in laws]
+    with Pool(workers, initializer=_init_worker, initargs=(doc.spec(),)) as pool:
+        return pool.map(_hash_law_worker, laws, chunksize=4)
+
+
+def iter_law_chunks(doc, laws, workers=1):
+    """Yield the chunk list of each law, in TOC order.
+
+    With workers > 1 laws are spread over a process pool.
+    """
+    if workers <= 1:
+        for law in laws:
+            yield extract_law(doc, law)
+        return
+
+    # imap keeps input order, so results merge back in TOC order.
+    # chunksize=1: law sizes vary wildly (the LGSS alone is hundreds of pages).
+    with Pool(workers, initializer=_init_worker, initargs=(doc.spec(),)) as pool:
+        yield from pool.imap(_extract_law_worker, laws, chunksize=1)
+
+
+def load_manifest(path, kind):
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("kind", "text") != kind:
+        print("Manifest version or extraction mode changed, doing a full rebuild")
+        return {}
+    return manifest
+
+
+def plan_incremental(laws, entries, manifest, out_dir):
+    """Compare page hashes with the previous manifest.
+
+    Returns the laws that must be re-extracted, the previous chunks grouped by law key
+    and the previous start page of each law.
+    """
+    old_laws = manifest.get("laws", {})
+    prev_chunks = defaultdict(list)
+    # The manifest describes the output it was written with (.json or .jsonl)
+    prev_path = os.path.join(out_dir, manifest.get("output", ""))
+    if old_laws and os.path.isfile(prev_path):
+        for c in iter_chunks(prev_path):
+            prev_chunks[law_key(c["law"])].append(c)
+    else:
+        old_laws = {}  # no usable previous output: full rebuild
+
+    key_counts = Counter(law_key(law["title"]) for law in laws)
+    changed = []
+    for law, entry in zip(laws, entries):
+        key = law_key(law["title"])
+        old = old_laws.get(key)
+        if key_counts[key] > 1 or not old or old["hash"] != entry["hash"]:
+            changed.append(law)
+
+    removed = set(old_laws) - set(key_counts)
+    print(f"Incremental: {len(laws) - len(changed)} laws unchanged, "
+          f"{len(changed)} to extract, {len(removed)} removed")
+    for law in changed[:20]:
+        print(f"  ~ {law['title'][:80]}")
+    for key in sorted(removed)[:20]:
+        print(f"  - {key[:80]}")
+    prev_starts = {key: old["pages"][0] for key, old in old_laws.items()}
+    return changed, prev_chunks, prev_starts
+
+
+def moved_chunk(chunk, law, shift):
+    """A reused chunk with the law's current title and pages (the law moved by shift pages)."""
+    chunk = dict(chunk, law=law["title"])
+    if "page" in chunk:
+        chunk["page"] += shift
+    if "pages" in chunk:
+        chunk["pages"] = f"{law['start_page']}-{law['end_page']-1}"
+    return chunk
+
+
+def iter_spliced_chunks(doc, laws, changed, prev_chunks, prev_starts, workers=1):
+    """Yield each law's chunks in TOC order: fresh for changed laws, reused for the rest."""
+    extracted = iter_law_chunks(doc, changed, workers)
+    changed_idx = {law["idx"] for law in changed}
+    for law in laws:
+        if law["idx"] in changed_idx:
+            yield next(extracted)
         else:
-            chunks.append({
-                "law": law_title,
-                "section": art_title,
-                "text": text.strip(),
-            })
+            # Same content: keep the old chunks, refreshing the (possibly renumbered) title
+            # and the page numbers (page hashes ignore page numbers, so the law may have moved)
+            key = law_key(law["title"])
+            shift = law["start_page"] - prev_starts[key]
+            yield [moved_chunk(c, law, shift) for c in prev_chunks.get(key, [])]
+
+
+class ChunkStats:
+    """Running stats so streaming mode never needs the full chunk list."""
+
+    def __init__(self, sample_from=50, sample_size=3):
+        self.text_lens = []
+        self.law_names = set()
+        self.samples = []
+        self.sample_from = sample_from
+        self.sample_size = sample_size
+
+    def add(self, chunks):
+        for c in chunks:
+            n = len(self.text_lens)
+            if self.sample_from <= n < self.sample_from + self.sample_size:
+                self.samples.append(c)
+            self.text_lens.append(len(c["text"]))
+            self.law_names.add(c["law"])
+
+    def print(self):
+        text_lens = self.text_lens
+        print(f"\nTotal chunks: {len(text_lens)}")
+
+        # Show some stats
+        print(f"Avg chunk size: {sum(text_lens)//len(text_lens)} chars")
+        print(f"Min: {min(text_lens)}, Max: {max(text_lens)}")
+        print(f"Median: {sorted(text_lens)[len(text_lens)//2]}")
+        print(f"Chunks > 5000 chars: {sum(1 for l in text_lens if l > 5000)}")
+        print(f"Chunks < 200 chars: {sum(1 for l in text_lens if l < 200)}")
+
+        # Show unique laws
+        print(f"\nUnique laws/norms: {len(self.law_names)}")
+
+        # Show sample
+        print("\n=== SAMPLE CHUNKS ===")
+        for c in self.samples:
+            print(f"\n--- {c['law'][:70]}")
+            print(f"    {c['section'][:70]} ---")
+            print(c["text"][:500])
+            print(f"[{len(c['text'])} chars]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract article chunks from the BOE Código Laboral PDF")
+    parser.add_argument("--pdf", default=PDF_PATH, help="PDF path")
+    parser.add_argument("--out-dir", default=OUT_DIR, help="Output directory")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes (default: 1, serial)")
+    parser.add_argument("--jsonl", action="store_true",
+                        help="Stream chunks to normativa_chunks.jsonl as each law finishes")
+    parser.add_argument("--cache", default=CACHE_PATH, help="Page-text cache (SQLite)")
+    parser.add_argument("--no-cache", action="store_true", help="Always read pages with PyMuPDF")
+    parser.add_argument("--layout", action="store_true",
+                        help="Leave out running headers/footers using block geometry (pdf_layout.py)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse chunks of laws whose page hashes match the previous manifest")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    doc = open_pdf(args.pdf, cache_path=None if args.no_cache else args.cache,
+                   kind="layout" if args.layout else "text")
+    toc = doc.get_toc()
+
+    # Chapter tree for enhance_chunks.py, saved next to the chunks
+    tree_path = os.path.join(args.out_dir, TREE_NAME)
+    TocTree.from_toc(toc, len(doc)).save(tree_path)
+    print(f"TOC tree: {tree_path}")
+
+    # Step 1: Identify each law/norm (L1 entries starting with §)
+    laws = find_laws(toc, len(doc))
+
+    print(f"Found {len(laws)} laws/norms")
+    for l in laws[:10]:
+        print(f"  {l['title'][:80]}  (pp. {l['start_page']}-{l['end_page']-1})")
+    print("  ...")
+    for l in laws[-5:]:
+        print(f"  {l['title'][:80]}  (pp. {l['start_page']}-{l['end_page']-1})")
+
+    # Step 2: For each law, extract text and split by article pattern
+    out_path = os.path.join(args.out_dir, "normativa_chunks.jsonl" if args.jsonl else "normativa_chunks.json")
+    manifest_path = os.path.join(args.out_dir, MANIFEST_NAME)
+    # Hashed on every run (pages come from the cache), so the manifest always
+    # describes the output on disk, whatever mode wrote it
+    entries = hash_laws(doc, laws, workers=args.workers)
+    if args.incremental:
+        changed, prev_chunks, prev_starts = plan_incremental(laws, entries, load_manifest(manifest_path, doc.kind),
+                                                             args.out_dir)
+        law_chunk_iter = iter_spliced_chunks(doc, laws, changed, prev_chunks, prev_starts,
+                                             workers=args.workers)
+    else:
+        changed = laws
+        law_chunk_iter = iter_law_chunks(doc, laws, workers=args.workers)
+    # The output is about to be overwritten: a run that fails halfway leaves no manifest
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    stats = ChunkStats()
+    if args.jsonl:
+        with JsonlWriter(out_path) as writer:
+            for law_chunks in law_chunk_iter:
+                writer.write(law_chunks)
+                stats.add(law_chunks)
+    else:
+        chunks = []
+        for law_chunks in law_chunk_iter:
+            chunks.extend(law_chunks)
+        stats.add(chunks)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(chunks, f, ensure_ascii=False, indent=2)
+    doc.close()
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "kind": doc.kind,
+        "pdf": args.pdf,
+        "output": os.path.basename(out_path),
+        "laws": {law_key(e["title"]): e for e in entries},
+        "changed": [law_key(law["title"]) for law in changed],
+    }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    print(f"Manifest: {manifest_path} ({len(changed)} laws changed)")
+
+    stats.print()
+
+    print(f"\nSaved to {out_path}")
+    print(f"File size: {os.path.getsize(out_path) / 1024 / 1024:.1f} MB")
+
 
-doc.close()
-
-print(f"\nTotal chunks: {len(chunks)}")
-
-# Show some stats
-text_lens = [len(c["text"]) for c in chunks]
-print(f"Avg chunk size: {sum(text_lens)//len(text_lens)} chars")
-print(f"Min: {min(text_lens)}, Max: {max(text_lens)}")
-print(f"Median: {sorted(text_lens)[len(text_lens)//2]}")
-print(f"Chunks > 5000 chars: {sum(1 for l in text_lens if l > 5000)}")
-print(f"Chunks < 200 chars: {sum(1 for l in text_lens if l < 200)}")
-
-# Show unique laws
-law_names = set(c["law"] for c in chunks)
-print(f"\nUnique laws/norms: {len(law_names)}")
-
-# Show sample
-print("\n=== SAMPLE CHUNKS ===")
-for c in chunks[50:53]:
-    print(f"\n--- {c['law'][:70]}")
-    print(f"    {c['section'][:70]} ---")
-    print(c["text"][:500])
-    print(f"[{len(c['text'])} chars]")
-
-# Save
-out_path = os.path.join(OUT_DIR, "normativa_chunks.json")
-with open(out_path, "w", encoding="utf-8") as f:
-    json.dump(chunks, f, ensure_ascii=False, indent=2)
-print(f"\nSaved to {out_path}")
-print(f"File size: {os.path.getsize(out_path) / 1024 / 1024:.1f} MB")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Incremental check of a JSON object answer while it streams in.
+
+JsonStream is fed the content deltas of a streamed chat completion. It scans them
+once (strings, escapes, nesting) and says, as early as the text allows, whether
+the answer can still become the object it expects:
+
+  "ok"       keep reading
+  "done"     the top-level object is closed and has every required field
+  "invalid"  it cannot: no "{" within PREAMBLE_CHARS, a field of the wrong type,
+             a list item that is not a string, or an object closed with a field
+             missing
+
+The caller stops the request on "invalid", not after a whole wasted completion.
+result() parses the object and ignores any text before or after it (a ``` fence,
+"Aquí tienes el JSON:"). If the answer was cut off (finish_reason "length"), it
+repairs it: it goes back to one of the last complete values and closes the open
+brackets. Only if that fails does it also close the open string.
+
+Usage:
+    from json_stream import JsonStream
+    watch = JsonStream({"resumen": str, "palabras_clave": list, "preguntas": list})
+    async for event in stream:
+        if watch.feed(delta) == "invalid":
+            await stream.close()
+            break
+    result = watch.result()   # dict, or None
+"""
+import json
+
+PREAMBLE_CHARS = 200  # text allowed before the object ("```json", "Aquí tienes el JSON:")
+REPAIR_CUTS = 3  # complete values to go back over when repairing a truncated answer
+
+_CLOSERS = {"{": "}", "[": "]"}
+_STARTS = {str: '"', list: "[", dict: "{"}
+
+
+class JsonStream:
+    """Scanner for one streamed JSON object with the given {field: type} schema."""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.text = ""
+        self.status = "ok"
+        self.repaired = False
+        self.keys = set()
+        self._pos = 0
+        self._start = None       # index of the opening "{"
+        self._end = None         # index after the closing "}"
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._key_start = None   # set while reading a top-level key
+        self._key = None         # top-level field whose value is being read
+        self._expect = None      # what the next token must be: "key", "field" or "item"
+        self._cuts = []          # (index, open brackets) just after each complete value
+
+    def feed(self, delta):
+        """Add the next piece of content; returns the status."""
+        if self.status != "ok":
+            return self.status
+        self.text += delta
+        if self._start is None and not self._find_start():
+            return self.status
+        text = self.text
+        while self._pos < len(text) and self.status == "ok":
+            self._step(text[self._pos])
+            self._pos += 1
+        return self.status
+
+    def _find_start(self):
+        """Locate the opening "{" after a short preamble (fence, lead-in sentence)."""
+        i = self.text.find("{")
+        if i < 0 or i > PREAMBLE_CHARS:
+            if len(self.text) > PREAMBLE_CHARS:
+                self.status = "invalid"
+            return False
+        self._start = self._pos = i
+        return True
+
+    def _step(self, c):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._key_start is not None:
+                    self._key = self.text[self._key_start:self._pos]
+                    self.keys.add(self._key)
+                    self._key_start = None
+                else:
+                    self._value_done()
+            return
+        if c.isspace():
+            return
+
+        if self._expect and not self._check(c):
+            self.status = "invalid"
+            return
+        expect, self._expect = self._expect, None
+        depth = len(self._stack)
+
+        if c == '"':
+            self._in_string = True
+            if expect == "key":
+                self._key_start = self._pos + 1
+        elif c in _CLOSERS:
+            self._stack.append(c)
+            if c == "{" and depth == 0:
+                self._expect = "key"
+            elif c == "[" and self._in_field_list():
+                self._expect = "item"
+        elif c in "}]":
+            if not self._stack or _CLOSERS[self._stack.pop()] != c:
+                self.status = "invalid"
+                return
+            if not self._stack:
+                self._close()
+            else:
+                self._value_done()
+        elif c == ":" and depth == 1:
+            self._expect = "field"
+        elif c == ",":
+            if depth == 1:
+                self._expect = "key"
+            elif self._in_field_list():
+                self._expect = "item"
+
+    def _check(self, c):
+        """Is c an acceptable first character for what comes next?"""
+        if self._expect == "key":
+            return c in '"}'
+        if self._expect == "item":
+            return c in '"]'
+        expected = self.schema.get(self._key)  # "field": the value of self._key
+        return expected is None or c == _STARTS.get(expected, c)
+
+    def _in_field_list(self):
+        return len(self._stack) == 2 and self._stack[1] == "[" and self.schema.get(self._key) is list
+
+    def _value_done(self):
+        """Record a repair point after a string or a closed bracket (not after numbers)."""
+        if self._stack:
+            self._cuts.append((self._pos + 1, tuple(self._stack)))
+            del self._cuts[:-REPAIR_CUTS]
+
+    def _close(self):
+        self._end = self._pos + 1
+        missing = [k for k in self.schema if k not in self.keys]
+        self.status = "invalid" if missing else "done"
+
+    def result(self):
+        """The parsed object (repaired if the answer was cut off), or None."""
+        if self.status == "invalid" or self._start is None:
+            return None
+        if self._end is not None:
+            return self._valid(_loads(self.text[self._start:self._end]))
+        # Truncated: drop the unfinished value and close the brackets, or keep it
+        # (a cut-off last question) if that is the only way to a complete object
+        candidates = [self.text[self._start:pos] + _closing(stack) for pos, stack in reversed(self._cuts)]
+        if self._in_string and self._key_start is None and self._stack:
+            candidates.append(self.text[self._start:] + '"' + _closing(self._stack))
+        for text in candidates:
+            obj = self._valid(_loads(text))
+            if obj is not None:
+                self.repaired = True
+                return obj
+        return None
+
+    def _valid(self, obj):
+        if not isinstance(obj, dict):
+            return None
+        for key, kind in self.schema.items():
+            if not isinstance(obj.get(key), kind):
+                return None
+        return obj
+
+
+def _closing(stack):
+    return "".join(_CLOSERS[c] for c in reversed(stack))
+
+
+def _loads(text):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
@@ -0,0 +1,160 @@
+"""
+Persistent page-text cache for the PDFs read by the extraction scripts.
+
+Entries are keyed by the SHA-256 of the PDF file and hold its TOC and the text of
+every page in one SQLite file. A warm cache is served without opening PyMuPDF; pages
+missing on a cold run are extracted with fitz and stored on the way.
+
+Usage:
+    from pdf_cache import open_pdf
+    pdf = open_pdf(PDF_PATH)
+    toc = pdf.get_toc()
+    texts = pdf.page_texts(0, 10)
+
+    python pdf_cache.py <file.pdf>    # warm the cache for a PDF
+"""
+import hashlib, json, os, sqlite3, sys
+
+CACHE_PATH = "/home/javier/rag-ss/cache/pdf_pages.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pdfs (
+    hash TEXT PRIMARY KEY,
+    path TEXT,
+    num_pages INTEGER,
+    toc TEXT
+);
+CREATE TABLE IF NOT EXISTS pages (
+    hash TEXT,
+    kind TEXT,
+    page INTEGER,
+    text TEXT,
+    PRIMARY KEY (hash, kind, page)
+);
+"""
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class CachedPdf:
+    """Read-through cache in front of a fitz document.
+
+    Pages are 0-indexed, as in fitz. kind="text" caches plain get_text(),
+    kind="layout" the header/footer-free text of pdf_layout.py, stored as
+    "layout:<layout_version()>" so changing its settings starts a fresh set. With
+    cache_path=None every call goes straight to PyMuPDF.
+    """
+
+    def __init__(self, path, cache_path=CACHE_PATH, pdf_hash=None, kind="text"):
+        self.name = path
+        self.cache_path = cache_path
+        self.kind = kind
+        self._cache_kind = kind
+        if kind == "layout":
+            from pdf_layout import layout_version
+            self._cache_kind = f"layout:{layout_version()}"
+        self._doc = None
+        self._db = None
+        self._toc = None
+        self._num_pages = None
+        if cache_path:
+            self.hash = pdf_hash or file_sha256(path)
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            # Extraction workers share the file: WAL lets them read while one writes
+            self._db = sqlite3.connect(cache_path, timeout=60)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            row = self._db.execute(
+                "SELECT num_pages, toc FROM pdfs WHERE hash = ?", (self.hash,)).fetchone()
+            if row:
+                self._num_pages, self._toc = row[0], json.loads(row[1])
+        else:
+            self.hash = pdf_hash
+
+    def spec(self):
+        """Constructor arguments, so worker processes can reopen the same cache."""
+        return (self.name, self.cache_path, self.hash, self.kind)
+
+    def _fitz_doc(self):
+        if self._doc is None:
+            import fitz
+            self._doc = fitz.open(self.name)
+        return self._doc
+
+    def _load_meta(self):
+        doc = self._fitz_doc()
+        self._toc = doc.get_toc()
+        self._num_pages = len(doc)
+        if self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pdfs (hash, path, num_pages, toc) VALUES (?, ?, ?, ?)",
+                (self.hash, self.name, self._num_pages, json.dumps(self._toc, ensure_ascii=False)))
+            self._db.commit()
+
+    def get_toc(self):
+        if self._toc is None:
+            self._load_meta()
+        return self._toc
+
+    def __len__(self):
+        if self._num_pages is None:
+            self._load_meta()
+        return self._num_pages
+
+    def _extract(self, p):
+        page = self._fitz_doc()[p]
+        if self.kind == "layout":
+            from pdf_layout import page_text_layout
+            return page_text_layout(page)
+        return page.get_text()
+
+    def page_texts(self, start, end):
+        """Text of pages [start, end), filling the cache for any page not stored yet."""
+        if not self._db:
+            return [self._extract(p) for p in range(start, end)]
+
+        rows = self._db.execute(
+            "SELECT page, text FROM pages WHERE hash = ? AND kind = ? AND page >= ? AND page < ?",
+            (self.hash, self._cache_kind, start, end)).fetchall()
+        cached = dict(rows)
+        missing = [p for p in range(start, end) if p not in cached]
+        if missing:
+            for p in missing:
+                cached[p] = self._extract(p)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO pages (hash, kind, page, text) VALUES (?, ?, ?, ?)",
+                [(self.hash, self._cache_kind, p, cached[p]) for p in missing])
+            self._db.commit()
+        return [cached[p] for p in range(start, end)]
+
+    def page_text(self, p):
+        return self.page_texts(p, p + 1)[0]
+
+    def close(self):
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def open_pdf(path, cache_path=CACHE_PATH, **kwargs):
+    return CachedPdf(path, cache_path=cache_path, **kwargs)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python pdf_cache.py <file.pdf>")
+        sys.exit(1)
+    pdf = open_pdf(sys.argv[1])
+    n = len(pdf)
+    pdf.page_texts(0, n)
+    print(f"Cached {n} pages, {len(pdf.get_toc())} TOC entries ({pdf.hash[:12]}) in {CACHE_PATH}")
+    pdf.close()
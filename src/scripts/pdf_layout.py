@@ -0,0 +1,75 @@
+"""
+Layout-aware page text for the BOE códigos.
+
+Uses PyMuPDF block geometry (get_text("dict")) to leave out the running header and
+footer of every page: "CÓDIGO LABORAL Y DE LA SEGURIDAD SOCIAL", the "§ N" law line,
+"– N –" page numbers and BOE/CVE lines. They never reach the extracted text, so the
+regex passes of clean_chunks*.py have nothing left to remove, and a word hyphenated
+across a page break is no longer glued to header text.
+"""
+import hashlib, re
+
+# Blocks lying entirely inside these bands (fraction of page height) are
+# running headers/footers, whatever they say
+TOP_BAND = 0.06
+BOTTOM_BAND = 0.05
+
+# Running lines that occasionally sit just outside the bands
+RUNNING_LINE = re.compile(
+    r'(?:C[OÓ]DIGO LABORAL Y DE LA SEGURIDAD SOCIAL'
+    r'|§\s*\d+\b.*'
+    r'|–\s*\d+\s*–'
+    r'|-\s*\d+\s*-'
+    r'|P[aá]gina\s+\d+\s+de\s+\d+'
+    r'|BOLET[IÍ]N OFICIAL DEL ESTADO'
+    r'|[Cc]ve:\s*BOE-[A-Z]-\d+-\d+.*'
+    r'|Verificable en https?://www\.boe\.es.*)'
+)
+
+
+def layout_version():
+    """Short hash of the band and running-line settings: pdf_cache.py keys layout
+    pages by it, so tuning them never serves text cut with the old values."""
+    params = f"{TOP_BAND}|{BOTTOM_BAND}|{RUNNING_LINE.pattern}"
+    return hashlib.sha256(params.encode("utf-8")).hexdigest()[:12]
+
+
+def _is_running_block(lines):
+    return all(not l.strip() or RUNNING_LINE.fullmatch(l.strip()) for l in lines)
+
+
+def page_text_layout(page):
+    """Page text in get_text() format (one line per line) minus header/footer blocks."""
+    d = page.get_text("dict")
+    height = d["height"]
+    top, bottom = height * TOP_BAND, height * (1 - BOTTOM_BAND)
+
+    out = []
+    for block in d["blocks"]:
+        if block.get("type", 0) != 0:
+            continue  # image block
+        lines = ["".join(span["text"] for span in line["spans"]) for line in block["lines"]]
+        y0, y1 = block["bbox"][1], block["bbox"][3]
+        if y1 <= top or y0 >= bottom or _is_running_block(lines):
+            continue
+        for line in lines:
+            out.append(line + "\n")
+    return "".join(out)
+
+
+def is_word_char(ch):
+    # Same as regex \w for str patterns
+    return ch.isalnum() or ch == "_"
+
+
+def page_separators(texts):
+    """What to put after each page text when joining them: "\n", as the plain
+    extraction does, or "" after a page ending in a hyphenated word, so "traba-" /
+    "jador" stay on adjacent lines and the hyphen join downstream re-forms "trabajador".
+    """
+    seps = []
+    for i, t in enumerate(texts):
+        nxt = texts[i + 1] if i + 1 < len(texts) else ""
+        hyphenated = len(t) > 2 and t.endswith("-\n") and is_word_char(t[-3])
+        seps.append("" if hyphenated and nxt and is_word_char(nxt[0]) else "\n")
+    return seps
@@ -0,0 +1,234 @@
+"""
+Client-side rate control for the Azure OpenAI scripts.
+
+TokenBucket paces requests against a deployment's tokens-per-minute quota. Each
+request reserves its estimated cost (count_tokens: tiktoken when installed, a
+chars-per-token estimate otherwise) and waits until the budget covers it. The
+real usage returned by the API is settled afterwards, so estimation errors do
+not add up.
+
+AimdLimiter replaces a fixed asyncio.Semaphore. It caps requests in flight, adds
+about one slot per window of successful requests, and halves the cap when the
+endpoint throttles. Azure answers a 429 with retry-after / retry-after-ms, so every
+request waits that long before the next one is sent, not just the one that failed.
+When the x-ratelimit-remaining-* headers of a success show the quota almost used
+up, the cap stops growing.
+
+Usage:
+    bucket = TokenBucket(tpm=100_000)
+    reserved = count_tokens(prompt) + expected_output
+    await bucket.acquire(reserved)      # bucket.wait(reserved) in sync code
+    ...
+    bucket.settle(reserved, resp.usage.total_tokens)   # or bucket.refund(reserved) on a 429
+
+    limiter = AimdLimiter(initial=5, maximum=32)
+    async with limiter:
+        raw = await client.chat.completions.with_raw_response.create(...)
+    limiter.success(raw.headers)        # or limiter.throttled(err.response.headers) on a 429
+
+Build the client with max_retries=0, so the SDK does not retry 429s before the
+limiter sees them.
+"""
+import asyncio, time
+from email.utils import parsedate_to_datetime
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to CHARS_PER_TOKEN
+    tiktoken = None
+
+CHARS_PER_TOKEN = 3.0  # heuristic; Spanish legal text runs ~3.5-4 chars/token, so this overestimates
+BUDGET_SHARE = 0.95    # use this much of the quota; the rest absorbs estimation error
+BURST_SECONDS = 10     # Azure also enforces TPM over short windows, so cap bursts to ~10s of quota
+DEFAULT_PAUSE = 10.0  # seconds to hold all requests after a 429 without retry-after
+LOW_HEADROOM = 0.05   # stop growing once under 5% of the per-minute quota is left
+
+
+def retry_after(headers):
+    """Seconds to wait from retry-after-ms / retry-after headers, or None."""
+    if not headers:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _headroom(headers, kind):
+    """Fraction of the per-minute quota still unused ("requests" or "tokens"), or None."""
+    try:
+        remaining = float(headers[f"x-ratelimit-remaining-{kind}"])
+        limit = float(headers[f"x-ratelimit-limit-{kind}"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return remaining / limit if limit > 0 else None
+
+
+class AimdLimiter:
+    """Additive-increase / multiplicative-decrease cap on concurrent requests."""
+
+    def __init__(self, initial=5, minimum=1, maximum=32, decrease=0.5, default_pause=DEFAULT_PAUSE):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.default_pause = default_pause
+        self.in_flight = 0
+        self.throttles = 0
+        self._resume_at = 0.0   # monotonic time before which nothing is sent
+        self._cond = None
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.release()
+
+    async def acquire(self):
+        if self._cond is None:
+            self._cond = asyncio.Condition()  # created inside the running loop
+        async with self._cond:
+            while True:
+                pause = self._resume_at - time.monotonic()
+                if pause > 0:
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), pause)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self.in_flight < int(self.limit):
+                    break
+                else:
+                    await self._cond.wait()
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def success(self, headers=None):
+        """A request went through: grow by 1/limit (about +1 per window) unless quota is short."""
+        if headers is not None:
+            for kind in ("tokens", "requests"):
+                left = _headroom(headers, kind)
+                if left is not None and left < LOW_HEADROOM:
+                    return
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def throttled(self, headers=None):
+        """A 429: cut the cap and pause every request. Returns the pause in seconds."""
+        self.throttles += 1
+        pause = retry_after(headers)
+        if pause is None:
+            pause = self.default_pause
+        now = time.monotonic()
+        # Requests already in flight report the same overload: cut once per pause,
+        # so a burst of 429s does not collapse the cap to the minimum
+        if now >= self._resume_at:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+        self._resume_at = max(self._resume_at, now + pause)
+        return pause
+
+
+_encodings = {}
+
+
+def _encoding(name):
+    if tiktoken is None:
+        return None
+    enc = _encodings.get(name)
+    if enc is None:
+        try:
+            enc = _encodings[name] = tiktoken.get_encoding(name)
+        except Exception:  # encoding files not cached and no network
+            enc = _encodings[name] = False
+    return enc or None
+
+
+def count_tokens(text, encoding="o200k_base"):
+    """Tokens in text: exact with tiktoken (o200k_base for gpt-5, cl100k_base for embeddings)."""
+    enc = _encoding(encoding)
+    if enc:
+        return len(enc.encode(text, disallowed_special=()))
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def truncate_tokens(text, max_tokens, encoding="o200k_base"):
+    """(text cut to at most max_tokens tokens, its token count)."""
+    enc = _encoding(encoding)
+    if enc:
+        tokens = enc.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text, len(tokens)
+        return enc.decode(tokens[:max_tokens]), max_tokens
+    # Without tiktoken the estimate overcounts, so the cut stays under the limit
+    text = text[:int((max_tokens - 1) * CHARS_PER_TOKEN)]
+    return text, int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def chat_tokens(messages, encoding="o200k_base"):
+    """Prompt tokens of a chat request (message contents plus per-message framing)."""
+    return sum(count_tokens(m["content"], encoding) + 4 for m in messages) + 3
+
+
+class TokenBucket:
+    """Tokens-per-minute budget shared by every request to one deployment.
+
+    Reservations are taken in call order and may push the level below zero; the
+    caller then waits until the refill has paid that debt. A request larger than
+    the burst cap therefore waits for a full bucket instead of blocking forever.
+    """
+
+    def __init__(self, tpm, share=BUDGET_SHARE, burst_seconds=BURST_SECONDS):
+        self.rate = tpm * share / 60  # tokens per second
+        self.capacity = self.rate * burst_seconds
+        self.level = self.capacity
+        self._last = time.monotonic()
+        self.reserved = 0  # totals, to report how good the estimates were
+        self.used = 0
+
+    def reserve(self, tokens):
+        """Take tokens from the budget; returns the seconds to wait before sending."""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._last) * self.rate)
+        self._last = now
+        self.level -= tokens
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+    async def acquire(self, tokens):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def wait(self, tokens):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def settle(self, reserved, used):
+        """Replace a reservation by the real usage."""
+        self.level = min(self.capacity, self.level + reserved - used)
+        self.reserved += reserved
+        self.used += used
+
+    def refund(self, reserved):
+        """Give back a reservation the endpoint rejected (429) without using it."""
+        self.level = min(self.capacity, self.level + reserved)
+
+    def accuracy(self):
+        """Used / reserved tokens so far (1.0 = perfect estimates)."""
+        return self.used / self.reserved if self.reserved else 1.0
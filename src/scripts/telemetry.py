@@ -0,0 +1,144 @@
+"""
+Request telemetry: counters and histograms, as a JSON report and Prometheus text.
+
+Each histogram keeps its observations, so percentiles are exact (a full enrichment
+run is ~10K requests). Its buckets come from the name, as in Prometheus naming:
+"*_seconds" uses LATENCY_BUCKETS, "*_tokens" uses TOKEN_BUCKETS.
+
+Every series can carry labels (kind="chunk", outcome="ok"...). The labels given
+to Telemetry() (model, prompt version) are added to all of them, so reports of
+different runs or prompt versions can be compared side by side.
+
+Usage:
+    from telemetry import Telemetry
+    tm = Telemetry({"model": DEPLOYMENT, "prompt": PROMPT_VERSION})
+    tm.observe("latency_seconds", 3.2, kind="chunk")
+    tm.count("requests", outcome="ok")
+    tm.save("run.json", "run.prom")      # JSON report + node_exporter textfile
+
+    python telemetry.py run.json         # print a saved report
+"""
+import json, math, os, sys
+
+PREFIX = "enrich"
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+PERCENTILES = (50, 90, 95, 99)
+
+
+def buckets_for(name):
+    return LATENCY_BUCKETS if name.endswith("_seconds") else TOKEN_BUCKETS
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[k - 1]
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _label_text(key):
+    return ",".join(f'{k}="{v}"' for k, v in key)
+
+
+class Telemetry:
+    """Counters and histograms by (name, labels)."""
+
+    def __init__(self, labels=None):
+        self.labels = dict(labels or {})
+        self.counters = {}    # name -> {label key: value}
+        self.histograms = {}  # name -> {label key: [values]}
+
+    def count(self, name, n=1, **labels):
+        series = self.counters.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + n
+
+    def observe(self, name, value, **labels):
+        if value is None:
+            return
+        self.histograms.setdefault(name, {}).setdefault(_label_key(labels), []).append(value)
+
+    def report(self):
+        """{labels, counters, histograms} with count/sum/mean/max/percentiles/buckets."""
+        hists = {}
+        for name, series in self.histograms.items():
+            out = hists[name] = {}
+            for key, values in series.items():
+                values = sorted(values)
+                stats = {
+                    "count": len(values),
+                    "sum": round(sum(values), 3),
+                    "mean": round(sum(values) / len(values), 3),
+                    "max": values[-1],
+                }
+                for p in PERCENTILES:
+                    stats[f"p{p}"] = percentile(values, p)
+                stats["buckets"] = {str(b): sum(1 for v in values if v <= b) for b in buckets_for(name)}
+                out[_label_text(key) or "all"] = stats
+        return {
+            "labels": self.labels,
+            "counters": {name: {_label_text(k) or "all": v for k, v in series.items()}
+                         for name, series in self.counters.items()},
+            "histograms": hists,
+        }
+
+    def prometheus(self, prefix=PREFIX):
+        """Metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{metric}{self._labels(key)} {value}")
+        for name, series in sorted(self.histograms.items()):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for key, values in sorted(series.items()):
+                for b in buckets_for(name):
+                    le = self._labels(key, ("le", str(b)))
+                    lines.append(f"{metric}_bucket{le} {sum(1 for v in values if v <= b)}")
+                lines.append(f"{metric}_bucket{self._labels(key, ('le', '+Inf'))} {len(values)}")
+                lines.append(f"{metric}_sum{self._labels(key)} {sum(values)}")
+                lines.append(f"{metric}_count{self._labels(key)} {len(values)}")
+        return "\n".join(lines) + "\n"
+
+    def _labels(self, key, *extra):
+        """{a="x",...} with the run labels first; empty string if there are none."""
+        text = _label_text(_label_key(self.labels) + key + extra)
+        return f"{{{text}}}" if text else ""
+
+    def save(self, json_path, prom_path=None):
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        if prom_path:
+            # Written whole and renamed, so a textfile collector never reads half a file
+            tmp = prom_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.prometheus())
+            os.replace(tmp, prom_path)
+
+
+def print_report(report):
+    print(f"Labels: {report['labels']}")
+    for name, series in report["counters"].items():
+        for labels, value in series.items():
+            print(f"  {name} {{{labels}}}: {value}")
+    for name, series in report["histograms"].items():
+        print(f"\n{name}")
+        for labels, s in series.items():
+            pcts = "  ".join(f"p{p} {s[f'p{p}']:.4g}" for p in PERCENTILES)
+            print(f"  {{{labels}}}: n={s['count']}  mean {s['mean']:.4g}  {pcts}  max {s['max']:.4g}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python telemetry.py <report.json>")
+        sys.exit(1)
+    with open(sys.argv[1], encoding="utf-8") as f:
+        print_report(json.load(f))
@@ -0,0 +1,141 @@
+"""
+Fast cleaner for PDF boilerplate in chunk text (headers, footers, page numbers).
+
+clean_text() returns exactly what the sequential re.sub chain of clean_chunks_v2.py
+returned (that chain is kept verbatim in bench_clean.py as the reference).
+
+The fast path makes one scan for lines that could be boilerplate and cuts the
+matching spans out, reproducing what each old pattern consumed. It relies on the
+PyMuPDF layout: every header/footer on lines of its own, with real text between
+two of them. Whenever a text breaks that assumption (boilerplate mid-line, an
+unknown line that starts like boilerplate, two blocks with no text in between,
+a block at the very start or end), the fast path gives up and the text goes
+through the old chain (chain_clean). bench_clean.py checks byte-identity.
+
+Usage:
+    from text_cleaner import clean_text
+    cleaned = clean_text(chunk["text"])
+
+    python bench_clean.py     # speed + byte-identity against the old chain
+"""
+import re
+
+HEADER = "LABORAL Y DE LA SEGURIDAD SOCIAL"
+HEADER_LINES = ("CÓDIGO " + HEADER, "CODIGO " + HEADER)
+BOE_LINES = ("BOLETÍN OFICIAL DEL ESTADO", "BOLETIN OFICIAL DEL ESTADO")
+
+# Lines where one of the old patterns could start matching
+CANDIDATE = re.compile(
+    r'^(?:[–-]\s*(?:\d|$)|P[aá]gina(?:\s|$)|\[\s*(?:\.|$)|[Cc]ve:|Verificable en https?://www\.boe\.es)'
+    r'|(?:C[OÓ]DIGO ' + HEADER + r'|BOLET[IÍ]N OFICIAL DEL ESTADO)$',
+    re.MULTILINE
+)
+
+# Whole boilerplate lines. "ws": the old pattern also ate the blank lines after
+# it (a trailing \s*). "one": only the line and its "\n".
+LINE = re.compile(
+    r'(?P<ws>(?P<page>–\s*\d+\s*–)|-\s*\d+\s*-|P[aá]gina\s+\d+\s+de\s+\d+|\[\s*\.\s*\.\s*\.\s*\])\s*'
+    r'|(?P<one>[Cc]ve:\s*BOE-[A-Z]-\d+-\d+|Verificable en https?://www\.boe\.es).*'
+)
+
+# Tails of the header and BOE blocks, as the old patterns wrote them
+HEADER_PAGE = re.compile(r'–\s*\d+\s*–\s*\n?')
+BOE_TAIL = re.compile(r'(?:N[uú]m\.\s*\d+[^\n]*\n)?(?:Sec\.\s*[IVX]+[^\n]*\n)?')
+WS = re.compile(r'\s*')
+
+HYPHEN = re.compile(r'(\w)-\n(\w)')
+BLANK_RUN = re.compile(r'\n{3,}')
+
+# The old chain, in order (fallback)
+CHAIN = [
+    (re.compile(r'C[OÓ]DIGO LABORAL Y DE LA SEGURIDAD SOCIAL\n[^\n]*\n(?:–\s*\d+\s*–\s*\n?)?'), ''),
+    (re.compile(r'C[OÓ]DIGO LABORAL Y DE LA SEGURIDAD SOCIAL\n(?:–\s*\d+\s*–\s*\n?)?'), ''),
+    (re.compile(r'\n–\s*\d+\s*–\s*(?:\n|$)'), '\n'),
+    (re.compile(r'^–\s*\d+\s*–\s*\n'), ''),
+    (re.compile(r'\n-\s*\d+\s*-\s*(?:\n|$)'), '\n'),
+    (re.compile(r'\nP[aá]gina\s+\d+\s+de\s+\d+\s*(?:\n|$)'), '\n'),
+    (re.compile(r'BOLET[IÍ]N OFICIAL DEL ESTADO\n(?:N[uú]m\.\s*\d+[^\n]*\n)?(?:Sec\.\s*[IVX]+[^\n]*\n)?'), ''),
+    (re.compile(r'\n[Cc]ve:\s*BOE-[A-Z]-\d+-\d+[^\n]*(?:\n|$)'), '\n'),
+    (re.compile(r'\nVerificable en https?://www\.boe\.es[^\n]*(?:\n|$)'), '\n'),
+    (re.compile(r'\n\[\s*\.\s*\.\s*\.\s*\]\s*(?:\n|$)'), '\n'),
+]
+
+
+def chain_clean(text):
+    """The old chain (after the hyphen join): one re.sub per pattern."""
+    for pattern, repl in CHAIN:
+        text = pattern.sub(repl, text)
+    return text
+
+
+def boilerplate_spans(text):
+    """[start, end) spans the old chain removes, or None if the text is not line-clean."""
+    spans = []
+    last_end = -1
+    in_header = False
+    n = len(text)
+    for hit in CANDIDATE.finditer(text):
+        if hit.start() < last_end:
+            if in_header:
+                continue  # the header's "§" line or page number, gone with it
+            return None  # boilerplate inside a removed line: an earlier pass would cut it first
+        start = text.rfind("\n", 0, hit.start()) + 1
+        end = text.find("\n", hit.start())
+        if end < 0:
+            end = n
+        if start <= last_end:
+            return None  # right after another block: the old passes interact
+        line = text[start:end]
+
+        if line in HEADER_LINES:
+            ref_end = text.find("\n", end + 1) if end < n else -1
+            if ref_end < 0:
+                return None
+            page = HEADER_PAGE.match(text, ref_end + 1)
+            cut = page.end() if page else ref_end + 1
+            if cut < n and text[cut - 1] != "\n":
+                eol = text.find("\n", cut)
+                if CANDIDATE.match(text[cut:eol if eol >= 0 else n]):
+                    return None  # the page number ate the indent of a line that now looks like boilerplate
+        elif line in BOE_LINES:
+            if end == n:
+                return None
+            cut = BOE_TAIL.match(text, end + 1).end()
+        else:
+            m = LINE.fullmatch(line)
+            if m is None or (start == 0 and not m.group("page")):
+                return None  # starts like boilerplate but is not, or no "\n" before it
+            if m.group("one"):
+                cut = min(end + 1, n)
+            else:
+                ws_end = WS.match(text, end).end()
+                last_nl = text.rfind("\n", end, ws_end)
+                if start == 0 and last_nl < 0:
+                    return None
+                cut = n if ws_end == n and start > 0 else last_nl + 1
+        spans.append((start, cut))
+        last_end = cut
+        in_header = line in HEADER_LINES
+    return spans
+
+
+def clean_text(text):
+    """Remove PDF headers, footers, and page numbers from extracted text."""
+    if "-\n" in text:
+        text = HYPHEN.sub(r'\1\2', text)
+
+    spans = boilerplate_spans(text)
+    if spans is None:
+        text = chain_clean(text)
+    elif spans:
+        parts = []
+        pos = 0
+        for start, end in spans:
+            parts.append(text[pos:start])
+            pos = end
+        parts.append(text[pos:])
+        text = "".join(parts)
+
+    if "\n\n\n" in text:
+        text = BLANK_RUN.sub("\n\n", text)
+    return text.strip()
@@ -0,0 +1,172 @@
+"""
+TOC tree of the BOE Código PDF, indexed by page.
+
+The outline has three levels: L1 = law (§ N. name), L2 = LIBRO / TÍTULO / CAPÍTULO /
+Sección headings, L3 = articles. Every entry is kept in TOC order with its page
+interval [page, end_page) and its chapter path, i.e. the L2 headings in force there
+("LIBRO I > TÍTULO II > CAPÍTULO I"). A page of a law maps to its chapter with one
+dict lookup (the page's first article) or one bisect over that law's entry pages.
+
+extract_chunks.py builds the tree once from doc.get_toc() and saves it next to the
+chunk files. enhance_chunks.py loads it from there.
+
+Usage:
+    from toc_tree import TocTree
+    tree = TocTree.from_toc(doc.get_toc(), len(doc))
+    tree.save(os.path.join(OUT_DIR, TREE_NAME))
+
+    tree = TocTree.load(path)
+    tree.path_at(law_title, 57)   # chapter path of page 57 of that law
+    tree.article_paths()          # {(law title, article title): chapter path}
+
+    python toc_tree.py <file.pdf> [out.json]   # (re)build the tree, default TREE_PATH
+"""
+import json, re, os, sys
+from bisect import bisect_left
+
+CHUNKS_DIR = "/home/javier/rag-ss/chunks"
+TREE_NAME = "normativa_toc_tree.json"
+TREE_PATH = os.path.join(CHUNKS_DIR, TREE_NAME)
+TREE_VERSION = 1
+
+
+def push_l2(stack, title):
+    """Chapter stack after an L2 entry: drop the headings it closes, then add it."""
+    # Hierarchy order: LIBRO > TÍTULO > CAPÍTULO > SUBSECCIÓN > SECCIÓN
+    t_upper = title.upper()
+    if t_upper.startswith('LIBRO'):
+        return [title]  # Reset everything
+    if t_upper.startswith(('TÍTULO', 'TITULO')):
+        # Keep LIBRO, reset everything else
+        keep = ('LIBRO',)
+    elif t_upper.startswith(('CAPÍTULO', 'CAPITULO', 'CAP.')):
+        # Keep LIBRO + TÍTULO, reset CAPÍTULO and below
+        keep = ('LIBRO', 'TÍTULO', 'TITULO')
+    elif t_upper.startswith(('SUBSECCIÓN', 'SUBSECCION')):
+        # Keep LIBRO + TÍTULO + CAPÍTULO, reset SUBSECCIÓN and below
+        keep = ('LIBRO', 'TÍTULO', 'TITULO', 'CAPÍTULO', 'CAPITULO', 'CAP.')
+    elif t_upper.startswith(('SECCIÓN', 'SECCION', 'SECC.')):
+        # Keep everything above SECCIÓN
+        return [s for s in stack if not s.upper().startswith(('SECCIÓN', 'SECCION', 'SECC.'))] + [title]
+    else:
+        # Other L2 entries (e.g., "Disposiciones adicionales")
+        keep = ('LIBRO', 'TÍTULO', 'TITULO')
+    return [s for s in stack if s.upper().startswith(keep)] + [title]
+
+
+def normalize_title(title):
+    return re.sub(r'\s+', ' ', title).strip()
+
+
+class TocTree:
+    """TOC entries in order, with page intervals, chapter paths and a per-law page index."""
+
+    def __init__(self, nodes, num_pages):
+        self.nodes = nodes
+        self.num_pages = num_pages
+        # Page index: each law's entries sorted by start page (TOC order breaks ties)
+        by_law = {}
+        for i, n in enumerate(nodes):
+            by_law.setdefault(n["law"], []).append(i)
+        self._entries = {}
+        self._starts = {}
+        self._first_article = {}  # (law, page) -> path of the first article starting there
+        for law, idx in by_law.items():
+            idx.sort(key=lambda i: (nodes[i]["page"], i))
+            self._entries[law] = idx
+            self._starts[law] = [nodes[i]["page"] for i in idx]
+            for i in idx:
+                if nodes[i]["level"] == 3:
+                    self._first_article.setdefault((law, nodes[i]["page"]), nodes[i]["path"])
+
+    @classmethod
+    def from_toc(cls, toc, num_pages):
+        """Build the tree from a PyMuPDF get_toc() list ([level, title, page], 1-indexed pages)."""
+        nodes = []
+        law = ""
+        stack = []  # stack of L2 entries (reset on new L1)
+        open_at = {}  # level -> index of the last node at that level still without end_page
+        for level, title, page in toc:
+            title = title.strip()
+            if level == 1:
+                law, stack = title, []
+            elif level == 2:
+                stack = push_l2(stack, title)
+            # A new entry closes every open entry at its level or deeper
+            for lv in [lv for lv in open_at if lv >= level]:
+                nodes[open_at.pop(lv)]["end_page"] = page
+            open_at[level] = len(nodes)
+            nodes.append({
+                "level": level,
+                "title": title,
+                "page": page,
+                "end_page": num_pages + 1,
+                "law": law,
+                "path": " > ".join(stack),
+            })
+        return cls(nodes, num_pages)
+
+    def path_at(self, law, page):
+        """Chapter path of a (1-indexed) page of a law, for a chunk whose heading is there.
+
+        That is the path of the first article starting on the page, so headings
+        just above it count, or the path in force at the top of the page if no
+        article starts there.
+        """
+        path = self._first_article.get((law, page))
+        if path is not None:
+            return path
+        starts = self._starts.get(law)
+        if not starts:
+            return ""
+        k = bisect_left(starts, page) - 1
+        return self.nodes[self._entries[law][k]]["path"] if k >= 0 else ""
+
+    def article_paths(self):
+        """{(law title, normalized article title): chapter path} for the L3 entries."""
+        paths = {}
+        for n in self.nodes:
+            if n["level"] == 3:
+                paths[(n["law"], normalize_title(n["title"]))] = n["path"]
+        return paths
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": TREE_VERSION, "num_pages": self.num_pages, "nodes": self.nodes},
+                      f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        """The saved tree, or None if it is missing or from another TREE_VERSION."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        if data.get("version") != TREE_VERSION:
+            return None
+        return cls(data["nodes"], data["num_pages"])
+
+
+def load_or_build(tree_path, pdf_path):
+    """Load the saved tree, or build it from the PDF's TOC (via the page cache) and save it."""
+    tree = TocTree.load(tree_path)
+    if tree is None:
+        from pdf_cache import open_pdf
+        pdf = open_pdf(pdf_path)
+        tree = TocTree.from_toc(pdf.get_toc(), len(pdf))
+        pdf.close()
+        tree.save(tree_path)
+    return tree
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python toc_tree.py <file.pdf> [out.json]")
+        sys.exit(1)
+    out = sys.argv[2] if len(sys.argv) == 3 else TREE_PATH
+    if os.path.exists(out):
+        os.remove(out)
+    tree = load_or_build(out, sys.argv[1])
+    print(f"{len(tree.nodes)} TOC entries, {len(tree.article_paths())} articles, "
+          f"{len(tree._starts)} laws -> {out}")
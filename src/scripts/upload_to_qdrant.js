@@ -2,7 +2,9 @@
  * upload_to_qdrant.js — Sube chunks enriquecidos a Qdrant Cloud con embeddings + sparse vectors.
  *
  * Para cada chunk:
- * 1. Genera embedding con text-embedding-3-small (Azure OpenAI)
+ * 1. Genera embedding con text-embedding-3-small (Azure OpenAI), salvo si ya está en la
+ *    caché compartida de embeddings (embedding_cache.js, la misma que upload_to_search.py,
+ *    con la misma entrada: embeddingInput)
  * 2. Carga sparse vector precalculado (de build_tfidf.js)
  * 3. Sube a Qdrant con payload (law, chapter, section, text, resumen, palabras_clave)
  *
@@ -14,6 +16,7 @@
 
 const fs = require('fs');
 const path = require('path');
+const { EmbeddingCache, embeddingInput } = require('./embedding_cache');
 
 // --- Configuración ---
 const CHUNKS_PATH = path.join(__dirname, '..', '..', 'data', 'chunks', 'normativa_chunks_v3_enriched.json');
@@ -96,17 +99,9 @@ async function upsertBatch(collection, points) {
     return await resp.json();
 }
 
-// --- Construir texto para embedding ---
-// text-embedding-3-small max = 8191 tokens (~32K chars). Truncamos a 30K para margen.
-const MAX_EMBED_CHARS = 30000;
-function buildEmbeddingText(chunk) {
-    const parts = [];
-    if (chunk.law) parts.push(chunk.law);
-    if (chunk.section) parts.push(chunk.section);
-    if (chunk.text) parts.push(chunk.text);
-    const full = parts.join('\n');
-    return full.length > MAX_EMBED_CHARS ? full.slice(0, MAX_EMBED_CHARS) : full;
-}
+// --- Texto para embedding ---
+// embeddingInput (embedding_cache.js): ley + sección + texto cortado a 30K caracteres
+// (text-embedding-3-small admite 8191 tokens, ~32K chars), igual que upload_to_search.py.
 
 // --- Sleep ---
 function sleep(ms) {
@@ -196,6 +191,8 @@ async function main() {
     }
 
     // 4. Procesar en batches
+    const embedCache = new EmbeddingCache('text-embedding-3-small', 1536);
+    console.log(`Caché de embeddings: ${embedCache.count} vectores (${embedCache.npyPath})\n`);
     const total = chunks.length;
     let successCount = uploaded.size;
     let errorCount = 0;
@@ -221,8 +218,10 @@ async function main() {
 
         try {
             // Generar embeddings
-            const texts = batchChunks.map(c => buildEmbeddingText(c));
-            const embeddings = await embedBatch(texts);
+            const texts = batchChunks.map(embeddingInput);
+            const missesBefore = embedCache.misses;
+            const embeddings = await embedCache.embed(texts, embedBatch);
+            const calledApi = embedCache.misses > missesBefore;
 
             // Construir points para Qdrant
             const points = batchChunks.map((chunk, idx) => ({
@@ -267,7 +266,7 @@ async function main() {
             console.log(`  [${successCount}/${total}] Batch ${i}-${batchEnd} OK (${elapsed}s, ${rate} chunks/s, ETA ${eta}s)`);
 
             // Rate limit: Azure OpenAI tiene ~350K tokens/min para embeddings
-            await sleep(2000);
+            if (calledApi) await sleep(2000);
 
         } catch (err) {
             errorCount += batchChunks.length;
@@ -289,6 +288,8 @@ async function main() {
     console.log(`  Subidos: ${successCount}/${total}`);
     console.log(`  Errores: ${errorCount}`);
     console.log(`  Tiempo total: ${totalTime}s`);
+    console.log(`  Embeddings: ${embedCache.hits} reutilizados de la caché, ${embedCache.misses} nuevos`);
+    embedCache.close();
 
     // Verificar conteo en Qdrant
     try {
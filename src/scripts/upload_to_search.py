@@ -4,16 +4,62 @@ Embed chunks with text-embedding-3-small and upload to Azure AI Search index 'no
 Requires: pip install openai
 Input:  ~/rag-ss/chunks/normativa_chunks_enriched.json
 Output: Documents uploaded to Azure AI Search index 'normativa'
+Embedding calls are paced against the deployment's TPM quota (rate_control.TokenBucket).
+
+The embedded input is embedding_input(chunk): law, section and text, cut to the
+characters upload_to_qdrant.js keeps, then to MAX_INPUT_TOKENS by tokens
+(cl100k_base) in case those still exceed the model limit. Inputs are packed into
+embedding batches of up to MAX_BATCH_TOKENS and MAX_BATCH_INPUTS,
+so short chunks share one request. The sizes actually sent are reported at the end.
+
+Embedding and upload overlap in an asyncio pipeline with bounded queues.
+EMBED_CONCURRENCY embedding batches are in flight at once. Their documents are
+grouped into UPLOAD_BATCH uploads, which UPLOAD_WORKERS send concurrently (the
+urllib POST runs in a thread). Uploaded doc ids are checkpointed after every
+upload, so a full reindex is paced by the TPM budget, not by round trips in series.
+
+Uploads are reconciled per document: the response's per-key status decides which
+ids are done. Keys that failed with a transient code are sent again with backoff,
+and the rest are reported and left for the next run. When Search throttles
+(HTTP 503, or a 207 with throttled keys), the upload size shared by the workers is
+halved. It grows back by one document per clean upload, up to UPLOAD_BATCH.
+
+Vectors come from the shared embedding cache (embedding_cache.py) when the same
+input was embedded before, by this script or by upload_to_qdrant.js. Only distinct
+new inputs reach the API.
+
+Sync mode (--sync) keeps the index equal to the chunk file. MANIFEST_FILE maps
+each doc id to a hash of its content: the indexed fields plus the embedding model,
+dimensions and input limit. A run diffs the manifest against the chunks. It sends
+mergeOrUpload for new and changed docs, and delete for ids whose chunk is gone.
+Unchanged docs are not touched, and only changed texts are embedded. The manifest
+is saved after every upload. With no manifest yet, it starts from
+upload_progress.json: every doc is sent once (vectors come from the cache) and
+stale ids listed there are deleted. A run that would delete more than
+MAX_DELETE_FRACTION of the manifest (a truncated or wrong CHUNKS_FILE) still
+uploads, but deletes nothing unless --allow-mass-delete is given.
+
+Usage:
+    python upload_to_search.py           # upload chunks not in upload_progress.json
+    python upload_to_search.py --sync    # upload changed docs, delete removed ones
+    python upload_to_search.py --sync --allow-mass-delete   # ...even past MAX_DELETE_FRACTION
 """
 
+import argparse
+import asyncio
 import json
 import time
 import hashlib
+import http.client
 import urllib.request
 import urllib.error
 import ssl
 import os
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, RateLimitError
+
+from embedding_cache import EmbeddingCache, embedding_input
+from rate_control import TokenBucket, count_tokens, truncate_tokens
+from telemetry import Telemetry, print_report
 
 # ── Config (from environment variables) ──
 SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT", "https://ai-search-javi.search.windows.net")
@@ -23,13 +69,25 @@ SEARCH_INDEX = os.getenv("AZURE_SEARCH_INDEX", "normativa")
 OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_READER_ENDPOINT", "https://openai-reader-javi.cognitiveservices.azure.com")
 OPENAI_KEY = os.environ["AZURE_OPENAI_READER_KEY"]  # Required
 EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMS = 1536
 
 CHUNKS_FILE = "/home/javier/rag-ss/chunks/normativa_chunks_enriched.json"
 PROGRESS_FILE = "/home/javier/rag-ss/chunks/upload_progress.json"
-
-BATCH_SIZE = 16        # embeddings per batch
-UPLOAD_BATCH = 100     # docs per upload batch to Search
-EMBED_DELAY = 0.5      # seconds between embedding batches (rate limit)
+MANIFEST_FILE = "/home/javier/rag-ss/chunks/search_manifest.json"  # --sync: doc id -> content hash
+
+MAX_INPUT_TOKENS = 8191   # text-embedding-3-small limit per input
+MAX_BATCH_INPUTS = 256    # inputs per embedding request (the API allows 2048)...
+MAX_BATCH_TOKENS = 20_000 # ...and tokens, under the TokenBucket burst (~24K at EMBED_TPM)
+UPLOAD_BATCH = 100     # docs per upload batch to Search (the most; shrinks when throttled)
+MIN_UPLOAD_BATCH = 5
+MAX_UPLOAD_RETRIES = 6  # per doc, with exponential backoff...
+UPLOAD_BACKOFF = 2.0    # ...starting at this many seconds
+RETRY_STATUS = {409, 422, 429, 502, 503, 504, 413}  # per key or whole request: try again
+THROTTLE_STATUS = {429, 503, 413}                   # ...and send fewer docs at a time
+EMBED_TPM = 150_000    # text-embedding-3-small quota on the Reader endpoint
+EMBED_CONCURRENCY = 4  # embedding batches in flight
+UPLOAD_WORKERS = 3     # concurrent uploads to Search
+MAX_DELETE_FRACTION = 0.2  # --sync: most of the manifest one run may delete without --allow-mass-delete
 
 # ── SSL context (no verify for server) ──
 ssl_ctx = ssl.create_default_context()
@@ -37,7 +95,7 @@ ssl_ctx.check_hostname = False
 ssl_ctx.verify_mode = ssl.CERT_NONE
 
 # ── Azure OpenAI client ──
-client = AzureOpenAI(
+client = AsyncAzureOpenAI(
     api_key=OPENAI_KEY,
     api_version="2023-05-15",
     azure_endpoint=OPENAI_ENDPOINT
@@ -50,17 +108,34 @@ def generate_doc_id(chunk):
     return hashlib.md5(raw.encode()).hexdigest()
 
 
-def embed_texts(texts):
-    """Embed a batch of texts using text-embedding-3-small."""
-    response = client.embeddings.create(
-        input=texts,
-        model=EMBEDDING_MODEL
-    )
+embed_budget = TokenBucket(EMBED_TPM)
+embed_stats = Telemetry({"model": EMBEDDING_MODEL})  # sizes of the requests actually sent
+
+
+async def embed_texts(texts):
+    """Embed a batch of texts using text-embedding-3-small, once the TPM budget allows it."""
+    reserved = sum(count_tokens(t, "cl100k_base") for t in texts)
+    embed_stats.observe("batch_inputs", len(texts))
+    embed_stats.observe("batch_tokens", reserved)
+    await embed_budget.acquire(reserved)
+    try:
+        response = await client.embeddings.create(
+            input=texts,
+            model=EMBEDDING_MODEL
+        )
+    except RateLimitError:
+        embed_budget.refund(reserved)
+        raise
+    embed_budget.settle(reserved, response.usage.total_tokens)
     return [item.embedding for item in response.data]
 
 
 def upload_to_search(documents):
-    """Upload a batch of documents to Azure AI Search."""
+    """Upload a batch of documents to Azure AI Search.
+
+    Returns (HTTP status, {key: (succeeded, statusCode, errorMessage)}); the dict is
+    empty when the whole request failed.
+    """
     url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX}/docs/index?api-version=2024-07-01"
     body = json.dumps({"value": documents}).encode("utf-8")
 
@@ -71,13 +146,77 @@ def upload_to_search(documents):
     try:
         with urllib.request.urlopen(req, context=ssl_ctx) as resp:
             result = json.loads(resp.read().decode())
-            ok = sum(1 for r in result.get("value", []) if r.get("status"))
-            fail = sum(1 for r in result.get("value", []) if not r.get("status"))
-            return ok, fail
+            return resp.status, {
+                r["key"]: (bool(r.get("status")), r.get("statusCode"), r.get("errorMessage"))
+                for r in result.get("value", [])
+            }
     except urllib.error.HTTPError as e:
         error_body = e.read().decode()
         print(f"  Upload error HTTP {e.code}: {error_body[:300]}")
-        return 0, len(documents)
+        return e.code, {}
+
+
+async def upload_with_retry(docs, upload_size):
+    """Upload [(doc_id, doc)] until each key succeeds or fails for good.
+
+    upload_size is a one-item list shared by the workers: the docs per request,
+    halved on throttling. Returns (uploaded ids, failed ids).
+    """
+    done, failed = [], []
+    pending = list(docs)
+    tries = {}
+    while pending:
+        size = int(upload_size[0])
+        part, pending = pending[:size], pending[size:]
+        try:
+            code, results = await asyncio.to_thread(upload_to_search, [doc for _, doc in part])
+        except (urllib.error.URLError, OSError, http.client.HTTPException) as e:
+            # HTTPException: connection cut mid-response (IncompleteRead, RemoteDisconnected)
+            print(f"  Upload error: {e!r}")
+            code, results = None, {}
+        except (ValueError, KeyError) as e:
+            # Unreadable response (not JSON, "value" item without "key"): retrying
+            # would not help, and raising would kill the worker and hang the queue
+            print(f"  Bad upload response: {e!r}")
+            failed.extend(doc_id for doc_id, _ in part)
+            continue
+
+        retry = []
+        throttled = code in THROTTLE_STATUS
+        if results:
+            for doc_id, doc in part:
+                ok, status, message = results.get(doc_id, (False, None, "missing from the response"))
+                if ok:
+                    done.append(doc_id)
+                elif status in RETRY_STATUS:
+                    retry.append((doc_id, doc))
+                    throttled = throttled or status in THROTTLE_STATUS
+                else:
+                    failed.append(doc_id)
+                    print(f"  Doc {doc_id} rejected ({status}): {(message or '')[:200]}")
+        elif code is None or code in RETRY_STATUS:
+            retry = part  # the whole request failed in transit or was throttled
+        else:
+            failed.extend(doc_id for doc_id, _ in part)  # e.g. 400: fix the data, next run retries
+
+        if throttled:
+            upload_size[0] = max(MIN_UPLOAD_BATCH, upload_size[0] / 2)
+        elif not retry:
+            upload_size[0] = min(UPLOAD_BATCH, upload_size[0] + 1)
+
+        if retry:
+            for doc_id, _ in retry:
+                tries[doc_id] = tries.get(doc_id, 0) + 1
+            failed.extend(doc_id for doc_id, _ in retry if tries[doc_id] > MAX_UPLOAD_RETRIES)
+            retry = [(doc_id, doc) for doc_id, doc in retry if tries[doc_id] <= MAX_UPLOAD_RETRIES]
+            if not retry:
+                continue
+            wait = UPLOAD_BACKOFF * 2 ** (max(tries[doc_id] for doc_id, _ in retry) - 1)
+            print(f"  Retrying {len(retry)} docs in {wait:.0f}s (HTTP {code}, "
+                  f"upload size {int(upload_size[0])})")
+            await asyncio.sleep(wait)
+            pending = retry + pending
+    return done, failed
 
 
 def load_progress():
@@ -95,12 +234,243 @@ def save_progress(uploaded_ids):
         json.dump(list(uploaded_ids), f)
 
 
+def load_manifest():
+    """Load the sync manifest: {doc_id: content hash}, or None if there is none yet."""
+    try:
+        with open(MANIFEST_FILE, "r") as f:
+            return json.load(f)["docs"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+
+
+def save_manifest(manifest):
+    """Save the manifest (written whole and renamed, so a crash never leaves half a file)."""
+    tmp = MANIFEST_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"model": EMBEDDING_MODEL, "dims": EMBEDDING_DIMS, "docs": manifest}, f)
+    os.replace(tmp, MANIFEST_FILE)
+
+
+def content_hash(doc_id, chunk):
+    """Hash of everything that ends up in the indexed doc, vector inputs included."""
+    doc = build_document(doc_id, chunk, None)
+    del doc["text_vector"]
+    raw = json.dumps([EMBEDDING_MODEL, EMBEDDING_DIMS, MAX_INPUT_TOKENS, embedding_input(chunk), doc],
+                     sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def token_batches(remaining):
+    """[(doc_id, chunk, text)] batches packed by token count; text is embedding_input(chunk),
+    cut to MAX_INPUT_TOKENS."""
+    batch = []
+    batch_tokens = 0
+    for doc_id, chunk in remaining:
+        full = embedding_input(chunk)
+        text, tokens = truncate_tokens(full, MAX_INPUT_TOKENS, "cl100k_base")
+        if text != full:
+            embed_stats.count("truncated_inputs")
+        if batch and (batch_tokens + tokens > MAX_BATCH_TOKENS or len(batch) >= MAX_BATCH_INPUTS):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append((doc_id, chunk, text))
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def build_document(doc_id, chunk, embedding):
+    return {
+        "@search.action": "mergeOrUpload",
+        "id": doc_id,
+        "law": chunk.get("law", ""),
+        "chapter": chunk.get("chapter", ""),
+        "section": chunk.get("section", ""),
+        "text": chunk.get("text", ""),
+        "resumen": chunk.get("resumen", ""),
+        "palabras_clave": chunk.get("palabras_clave", []),
+        "preguntas": "\n".join(chunk.get("preguntas", [])),
+        "text_vector": embedding
+    }
+
+
+async def run_pipeline(remaining, on_uploaded):
+    """Embed and upload remaining [(doc_id, chunk)]; returns (uploaded, failed).
+
+    on_uploaded(done_ids) is called after every upload, to checkpoint them.
+    """
+    embed_queue = asyncio.Queue(maxsize=EMBED_CONCURRENCY * 2)   # batches of chunks
+    upload_queue = asyncio.Queue(maxsize=UPLOAD_WORKERS * 2)     # batches of documents
+    upload_buffer = []
+    upload_size = [UPLOAD_BATCH]
+    totals = {"ok": 0, "fail": 0, "embedded": 0}
+    embed_cache = EmbeddingCache(EMBEDDING_MODEL, EMBEDDING_DIMS)
+    start_time = time.time()
+
+    async def produce():
+        batch_start = 0
+        for batch in token_batches(remaining):
+            await embed_queue.put((batch_start, batch))
+            batch_start += len(batch)
+        for _ in range(EMBED_CONCURRENCY):
+            await embed_queue.put(None)
+
+    async def embed_worker():
+        while True:
+            item = await embed_queue.get()
+            if item is None:
+                return
+            batch_start, batch = item
+
+            texts = [text for _, _, text in batch]
+
+            # Embed (cached vectors and repeated texts cost nothing)
+            try:
+                embeddings = await embed_cache.embed(texts, embed_texts)
+            except Exception as e:
+                print(f"  Embedding error at batch {batch_start}: {e}")
+                await asyncio.sleep(5)
+                try:
+                    embeddings = await embed_cache.embed(texts, embed_texts)
+                except Exception as e2:
+                    print(f"  Retry failed: {e2}")
+                    totals["fail"] += len(batch)  # left for the next run
+                    continue
+
+            for i, (doc_id, chunk, _) in enumerate(batch):
+                upload_buffer.append((doc_id, build_document(doc_id, chunk, embeddings[i])))
+            totals["embedded"] += len(batch)
+
+            # Hand full uploads to the upload workers (waits if they are behind)
+            while len(upload_buffer) >= UPLOAD_BATCH:
+                docs = upload_buffer[:UPLOAD_BATCH]
+                del upload_buffer[:UPLOAD_BATCH]
+                await upload_queue.put(docs)
+
+    async def upload_worker():
+        while True:
+            docs = await upload_queue.get()
+            if docs is None:
+                return
+            try:
+                done_ids, failed_ids = await upload_with_retry(docs, upload_size)
+                on_uploaded(done_ids)
+            except Exception as e:
+                # Fail this batch, not the worker: with every uploader gone the embed
+                # workers would block on upload_queue.put forever. Docs uploaded but
+                # not checkpointed are sent again next run (mergeOrUpload).
+                print(f"  Upload batch failed: {e!r}")
+                done_ids, failed_ids = [], [doc_id for doc_id, _ in docs]
+            totals["ok"] += len(done_ids)
+            totals["fail"] += len(failed_ids)
+
+            # Progress
+            done = totals["ok"] + totals["fail"]
+            elapsed = time.time() - start_time
+            rate = done / elapsed * 60 if elapsed > 0 else 0
+            eta = (len(remaining) - done) / rate if rate > 0 else 0
+            print(f"[{done}/{len(remaining)}] {totals['ok']} ok, {totals['fail']} err | "
+                  f"{totals['embedded']} embedded | {rate:.0f}/min | ETA: {eta:.0f}min")
+
+    uploaders = [asyncio.create_task(upload_worker()) for _ in range(UPLOAD_WORKERS)]
+    await asyncio.gather(produce(), *(embed_worker() for _ in range(EMBED_CONCURRENCY)))
+
+    # Upload remaining buffer
+    if upload_buffer:
+        await upload_queue.put(list(upload_buffer))
+        upload_buffer.clear()
+    for _ in range(UPLOAD_WORKERS):
+        await upload_queue.put(None)
+    await asyncio.gather(*uploaders)
+    print(f"Embedding cache: {embed_cache.hits} reused, {embed_cache.misses} embedded ({embed_cache.npy_path})")
+    print("\nEmbedding requests:")
+    print_report(embed_stats.report())
+    embed_cache.close()
+    return totals["ok"], totals["fail"]
+
+
+async def delete_docs(doc_ids, on_deleted):
+    """Send delete actions for doc_ids; returns (deleted, failed)."""
+    upload_size = [UPLOAD_BATCH]
+    total_ok, total_fail = 0, 0
+    for i in range(0, len(doc_ids), UPLOAD_BATCH):
+        docs = [(doc_id, {"@search.action": "delete", "id": doc_id})
+                for doc_id in doc_ids[i:i + UPLOAD_BATCH]]
+        done_ids, failed_ids = await upload_with_retry(docs, upload_size)
+        on_deleted(done_ids)
+        total_ok += len(done_ids)
+        total_fail += len(failed_ids)
+        print(f"[{i + len(docs)}/{len(doc_ids)}] {total_ok} deleted, {total_fail} err")
+    return total_ok, total_fail
+
+
+async def sync(chunks, allow_mass_delete=False):
+    """Upload new and changed docs and delete removed ones, per the manifest."""
+    manifest = load_manifest()
+    if manifest is None:
+        manifest = dict.fromkeys(load_progress())
+        print(f"No manifest yet: starting from {len(manifest)} ids in {PROGRESS_FILE}")
+    else:
+        print(f"Manifest: {len(manifest)} docs")
+
+    # The same law|section twice is one doc in the index: the last chunk wins
+    current = {generate_doc_id(chunk): chunk for chunk in chunks}
+    hashes = {doc_id: content_hash(doc_id, chunk) for doc_id, chunk in current.items()}
+    changed = [(doc_id, chunk) for doc_id, chunk in current.items() if manifest.get(doc_id) != hashes[doc_id]]
+    removed = sorted(set(manifest) - set(current))
+    new = sum(1 for doc_id, _ in changed if doc_id not in manifest)
+    print(f"Docs: {len(current)} | {new} new, {len(changed) - new} changed, "
+          f"{len(current) - len(changed)} unchanged, {len(removed)} to delete")
+    if len(removed) > MAX_DELETE_FRACTION * len(manifest) and not allow_mass_delete:
+        print(f"  Refusing to delete {len(removed)} of {len(manifest)} docs (more than "
+              f"{MAX_DELETE_FRACTION:.0%}): check {CHUNKS_FILE}, or pass --allow-mass-delete")
+        removed = []
+
+    def on_uploaded(done_ids):
+        manifest.update((doc_id, hashes[doc_id]) for doc_id in done_ids)
+        save_manifest(manifest)
+
+    def on_deleted(done_ids):
+        for doc_id in done_ids:
+            del manifest[doc_id]
+        save_manifest(manifest)
+
+    uploaded = failed = deleted = 0
+    # Upload first, so a recut law is never missing from the index in between
+    if changed:
+        uploaded, failed = await run_pipeline(changed, on_uploaded)
+    if removed:
+        print(f"\nDeleting {len(removed)} removed docs")
+        deleted, delete_failed = await delete_docs(removed, on_deleted)
+        failed += delete_failed
+    await client.close()
+    # Keep the default mode's progress in step with what the index now holds
+    save_progress(set(manifest))
+    return uploaded, deleted, failed, len(manifest)
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Embed chunks and upload them to Azure AI Search")
+    parser.add_argument("--sync", action="store_true",
+                        help="Upload only new/changed docs and delete removed ones (manifest diff)")
+    parser.add_argument("--allow-mass-delete", action="store_true",
+                        help=f"With --sync, delete even more than {MAX_DELETE_FRACTION:.0%} of the indexed docs")
+    args = parser.parse_args()
+
     # Load chunks
     with open(CHUNKS_FILE, "r", encoding="utf-8") as f:
         chunks = json.load(f)
     print(f"Loaded {len(chunks)} chunks")
 
+    if args.sync:
+        start_time = time.time()
+        uploaded, deleted, failed, total = asyncio.run(sync(chunks, args.allow_mass_delete))
+        elapsed = time.time() - start_time
+        print(f"\nSynced! {uploaded} uploaded, {deleted} deleted, {failed} failed in {elapsed/60:.1f} min")
+        print(f"Total in index: {total}")
+        return
+
     # Load progress
     uploaded_ids = load_progress()
     print(f"Already uploaded: {len(uploaded_ids)}")
@@ -117,82 +487,17 @@ def main():
         print("All chunks already uploaded!")
         return
 
-    # Process in embedding batches
-    total_ok = 0
-    total_fail = 0
-    upload_buffer = []
-    start_time = time.time()
-
-    for batch_start in range(0, len(remaining), BATCH_SIZE):
-        batch = remaining[batch_start:batch_start + BATCH_SIZE]
-
-        # Prepare texts for embedding
-        texts = [chunk.get("text", "")[:8000] for _, chunk in batch]
-
-        # Embed
-        try:
-            embeddings = embed_texts(texts)
-        except Exception as e:
-            print(f"  Embedding error at batch {batch_start}: {e}")
-            time.sleep(5)
-            try:
-                embeddings = embed_texts(texts)
-            except Exception as e2:
-                print(f"  Retry failed: {e2}")
-                continue
-
-        # Build search documents
-        for i, (doc_id, chunk) in enumerate(batch):
-            doc = {
-                "@search.action": "mergeOrUpload",
-                "id": doc_id,
-                "law": chunk.get("law", ""),
-                "chapter": chunk.get("chapter", ""),
-                "section": chunk.get("section", ""),
-                "text": chunk.get("text", ""),
-                "resumen": chunk.get("resumen", ""),
-                "palabras_clave": chunk.get("palabras_clave", []),
-                "preguntas": "\n".join(chunk.get("preguntas", [])),
-                "text_vector": embeddings[i]
-            }
-            upload_buffer.append((doc_id, doc))
-
-        # Upload when buffer is full
-        if len(upload_buffer) >= UPLOAD_BATCH:
-            docs_to_upload = [doc for _, doc in upload_buffer]
-            ok, fail = upload_to_search(docs_to_upload)
-            total_ok += ok
-            total_fail += fail
-
-            if ok > 0:
-                for uid, _ in upload_buffer[:ok]:
-                    uploaded_ids.add(uid)
-
-            upload_buffer = []
-            save_progress(uploaded_ids)
-
-        # Progress
-        processed = batch_start + len(batch)
-        elapsed = time.time() - start_time
-        rate = processed / elapsed * 60 if elapsed > 0 else 0
-        eta = (len(remaining) - processed) / rate if rate > 0 else 0
-
-        if processed % (BATCH_SIZE * 4) == 0 or processed == len(remaining):
-            print(f"[{processed}/{len(remaining)}] {total_ok} ok, {total_fail} err | {rate:.0f}/min | ETA: {eta:.0f}min")
+    def on_uploaded(done_ids):
+        uploaded_ids.update(done_ids)
+        save_progress(uploaded_ids)
 
-        # Rate limit
-        time.sleep(EMBED_DELAY)
+    async def upload_all():
+        result = await run_pipeline(remaining, on_uploaded)
+        await client.close()
+        return result
 
-    # Upload remaining buffer
-    if upload_buffer:
-        docs_to_upload = [doc for _, doc in upload_buffer]
-        ok, fail = upload_to_search(docs_to_upload)
-        total_ok += ok
-        total_fail += fail
-        if ok > 0:
-            for uid, _ in upload_buffer[:ok]:
-                uploaded_ids.add(uid)
-        save_progress(uploaded_ids)
+    start_time = time.time()
+    total_ok, total_fail = asyncio.run(upload_all())
 
     elapsed = time.time() - start_time
     print(f"\nDone! {total_ok} uploaded, {total_fail} failed in {elapsed/60:.1f} min")